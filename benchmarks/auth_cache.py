@@ -0,0 +1,56 @@
+"""Authenticated-request overhead with the verified-JWT cache on and off.
+
+Measures `decode_token` on its own and a full request through a FastAPI route that
+depends on `get_current_user`, reusing one bearer token like a real client does.
+
+    python -m benchmarks.auth_cache --iterations 20000
+"""
+import argparse
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from shared.auth import TokenCache, auth_handler, get_current_user
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(current_user_id: int = Depends(get_current_user)):
+        return {"user_id": current_user_id}
+
+    return app
+
+def time_decode(token: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        auth_handler.decode_token(token)
+    return (time.perf_counter() - start) / iterations
+
+def time_requests(client: TestClient, headers: dict, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        client.get("/me", headers=headers)
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    token = auth_handler.create_access_token(42)
+    headers = {"Authorization": f"Bearer {token}"}
+    client = TestClient(build_app())
+    request_iterations = max(args.iterations // 10, 1)
+
+    for name, cache in (("cache off", None), ("cache on", TokenCache())):
+        auth_handler.token_cache = cache
+        decode = time_decode(token, args.iterations)
+        request = time_requests(client, headers, request_iterations)
+        print(f"{name:<10} decode_token {decode * 1e6:>8.2f} us   GET /me {request * 1e6:>9.2f} us")
+        if cache is not None:
+            print(f"{'':<10} hits {cache.hits}  misses {cache.misses}")
+
+if __name__ == "__main__":
+    main()
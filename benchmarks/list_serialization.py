@@ -0,0 +1,80 @@
+"""Rows per second through a list endpoint's read path: ORM + Pydantic vs shared.projection.
+
+Seeds posts in a sqlite database, then fetches and serializes pages of them both ways:
+
+  orm         select(Post) -> ORM objects -> PostResponse (from_attributes) -> stdlib json,
+              which is what FastAPI's response_model path does
+  projection  select(response columns) -> Rows -> dicts -> orjson
+
+    python -m benchmarks.list_serialization --posts 20000 --limit 100
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.pagination import seed
+
+def time_pages(fetch, serialize, pages: int, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for page in range(pages):
+            serialize(fetch(page))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'lists.db')}"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "post_service"))
+    import models, schemas, search
+    from pydantic import TypeAdapter
+    from shared.database import SessionLocal, get_engine
+    from shared.projection import Projection
+    from sqlalchemy import select
+
+    engine = get_engine()
+    models.Base.metadata.create_all(bind=engine)
+    pages = args.posts // args.limit
+    adapter = TypeAdapter(List[schemas.PostResponse])
+    projection = Projection(models.Post, schemas.PostResponse)
+
+    with SessionLocal() as db:
+        seed(db, models, args.posts)
+
+        def orm_page(page):
+            query = search.NEWEST_FIRST.apply(select(models.Post)).offset(page * args.limit).limit(args.limit)
+            rows = db.execute(query).scalars().all()
+            db.expunge_all()  # a request gets a fresh session, so no identity map reuse
+            return rows
+
+        def orm_serialize(rows):
+            return json.dumps(adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")).encode()
+
+        def projected_page(page):
+            query = search.NEWEST_FIRST.apply(projection.select()).offset(page * args.limit).limit(args.limit)
+            return db.execute(query).all()
+
+        # Same bytes out either way (modulo whitespace)
+        assert json.loads(orm_serialize(orm_page(0))) == json.loads(projection.body(projected_page(0)))
+
+        results = [
+            ("orm + pydantic + json", time_pages(orm_page, orm_serialize, pages, args.runs)),
+            ("projection + orjson", time_pages(projected_page, projection.body, pages, args.runs)),
+        ]
+    print(f"{args.posts} posts in pages of {args.limit}, median of {args.runs} runs")
+    for name, seconds in results:
+        print(f"{name:<24} {args.posts / seconds:>10,.0f} rows/s   {seconds / pages * 1000:>7.2f} ms/page")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Per-request cost of the shared metrics middleware.
+
+Drives a bare FastAPI app in-process (httpx ASGI transport, no sockets) with no middleware, the
+old analytics MetricsMiddleware (raw path labels, time.time) and shared.metrics.MetricsMiddleware,
+hitting /items/{id} with a different id every request. Reports mean time per request, the
+overhead against the bare app, and how many latency series each variant left in its registry.
+
+    python -m benchmarks.metrics_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from prometheus_client import CollectorRegistry, Histogram
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    if isinstance(middleware, type):
+        app.add_middleware(middleware)  # raw ASGI class
+    elif middleware is not None:
+        app.middleware("http")(middleware)
+    return app
+
+def legacy_middleware():
+    # analytics_service's previous MetricsMiddleware, on a private registry
+    registry = CollectorRegistry()
+    latency = Histogram('request_latency_seconds', 'Request latency in seconds', ['endpoint', 'method'], registry=registry)
+
+    async def middleware(request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        latency.labels(endpoint=request.url.path, method=request.method).observe(time.time() - start_time)
+        return response
+    return middleware, registry
+
+def series(registry, name: str) -> int:
+    return sum(1 for metric in registry.collect() if metric.name == name for sample in metric.samples if sample.name == f"{name}_count")
+
+async def drive(app: FastAPI, requests: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for item_id in range(200):  # warm up
+            await client.get(f"/items/{item_id}")
+        start = time.perf_counter()
+        for item_id in range(requests):
+            response = await client.get(f"/items/{item_id}")
+            assert response.status_code == 200
+        return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10_000)
+    args = parser.parse_args()
+
+    from prometheus_client import REGISTRY
+    from shared.metrics import MetricsMiddleware
+
+    legacy, legacy_registry = legacy_middleware()
+    bare = asyncio.run(drive(build_app(), args.requests))
+    results = [
+        ("none", bare, 0),
+        ("legacy (raw path)", asyncio.run(drive(build_app(legacy), args.requests)), series(legacy_registry, "request_latency_seconds")),
+        ("shared (template)", asyncio.run(drive(build_app(MetricsMiddleware), args.requests)), series(REGISTRY, "http_request_duration_seconds")),
+    ]
+    for name, micros, count in results:
+        print(f"{name:<20} {micros:>8.1f} us/request   overhead {micros - bare:>6.1f} us   latency series {count}")
+
+if __name__ == "__main__":
+    main()
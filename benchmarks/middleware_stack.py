@@ -0,0 +1,102 @@
+"""Per-request overhead of the shared middleware stack, 0 to 3 middlewares deep.
+
+Drives a bare FastAPI app in-process (httpx ASGI transport, no sockets) with the first n of
+error handling, rate limiting and metrics, once as the previous app.middleware("http")
+functions (Starlette's BaseHTTPMiddleware) and once as shared.middleware's raw ASGI classes.
+The rate limit is set high enough never to trigger.
+
+    python -m benchmarks.middleware_stack --requests 10000
+"""
+import argparse
+import asyncio
+import math
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+def legacy_middlewares(limiter):
+    # The pre-ASGI shared.middleware / shared.metrics functions
+    from shared.metrics import HTTP_METHODS, _http_child, http_requests_in_flight
+    from shared.rate_limit import route_template
+
+    async def error_handler(request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"detail": "Internal server error"})
+
+    async def rate_limit_middleware(request: Request, call_next):
+        client_ip = request.client.host if request.client else "unknown"
+        allowed, retry_after = await limiter.check(client_ip, request.method, route_template(request))
+        if not allowed:
+            retry_after = math.ceil(retry_after)
+            return JSONResponse(status_code=429, content={"detail": {"message": "Too many requests", "retry_after": retry_after}})
+        return await call_next(request)
+
+    async def metrics_middleware(request, call_next):
+        start = time.perf_counter()
+        http_requests_in_flight.inc()
+        status = "5xx"
+        try:
+            response = await call_next(request)
+            status = f"{response.status_code // 100}xx"
+            return response
+        finally:
+            http_requests_in_flight.dec()
+            route = request.scope.get("route")
+            method = request.method if request.method in HTTP_METHODS else "other"
+            _http_child(route.path if route is not None else "unmatched", method, status).observe(time.perf_counter() - start)
+
+    return [lambda app, middleware=middleware: app.middleware("http")(middleware) for middleware in (error_handler, rate_limit_middleware, metrics_middleware)]
+
+def asgi_middlewares(limiter):
+    from shared.metrics import MetricsMiddleware
+    from shared.middleware import ErrorHandlerMiddleware, RateLimitMiddleware
+
+    return [
+        lambda app: app.add_middleware(ErrorHandlerMiddleware),
+        lambda app: app.add_middleware(RateLimitMiddleware, limiter=limiter),
+        lambda app: app.add_middleware(MetricsMiddleware),
+    ]
+
+def build_app(installers) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    for install in installers:
+        install(app)
+    return app
+
+async def drive(app: FastAPI, requests: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for item_id in range(200):  # warm up
+            await client.get(f"/items/{item_id}")
+        start = time.perf_counter()
+        for item_id in range(requests):
+            response = await client.get(f"/items/{item_id}")
+            assert response.status_code == 200
+        return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10_000)
+    args = parser.parse_args()
+
+    from shared.rate_limit import InMemoryBackend, RateLimit, RateLimiter
+
+    limiter = RateLimiter(InMemoryBackend(), default=RateLimit(10 ** 9, 60))
+    legacy, asgi = legacy_middlewares(limiter), asgi_middlewares(limiter)
+    bare = asyncio.run(drive(build_app([]), args.requests))
+    print(f"{'middlewares':<12} {'BaseHTTPMiddleware':>20} {'raw ASGI':>20}")
+    for depth in range(4):
+        old = asyncio.run(drive(build_app(legacy[:depth]), args.requests)) if depth else bare
+        new = asyncio.run(drive(build_app(asgi[:depth]), args.requests)) if depth else bare
+        print(f"{depth:<12} {old:>9.1f} us (+{old - bare:>6.1f}) {new:>9.1f} us (+{new - bare:>6.1f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Deep-page latency: skip/limit vs keyset cursors on a user's posts.
+
+Seeds one user with many posts in a sqlite database and times fetching a page at increasing
+depths. Offset pages slow down linearly with depth; cursor pages should stay flat.
+
+    python -m benchmarks.pagination --posts 500000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def seed(db, models, posts: int, batch_size: int = 20_000):
+    from sqlalchemy import insert
+
+    start = datetime(2024, 1, 1)
+    for offset in range(0, posts, batch_size):
+        db.execute(insert(models.Post), [
+            {
+                "id": post_id,
+                "user_id": 1,
+                "content": "post",
+                "resume_url": "https://example.com/resume.pdf",
+                "job_title": "Engineer",
+                # A few posts per second so (created_at, id) ties get exercised
+                "created_at": start + timedelta(seconds=post_id // 3),
+            }
+            for post_id in range(offset + 1, min(offset + batch_size, posts) + 1)
+        ])
+        db.commit()
+
+def time_page(db, query, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = db.execute(query).scalars().all()
+        timings.append(time.perf_counter() - start)
+    assert rows
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination.db')}"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "post_service"))
+    import models, search
+    from sqlalchemy import select
+    from shared.database import SessionLocal, get_engine
+
+    engine = get_engine()
+    models.Base.metadata.create_all(bind=engine)
+    keyset = search.NEWEST_FIRST
+    with SessionLocal() as db:
+        seed(db, models, args.posts)
+        base = select(models.Post).filter(models.Post.user_id == 1)
+
+        depth = args.limit
+        while depth < args.posts:
+            offset_ms = time_page(db, keyset.apply(base).offset(depth).limit(args.limit), args.runs)
+            # Cursor for the row just before this page, as a client scrolling this far would hold
+            previous = db.execute(keyset.apply(base).offset(depth - args.limit).limit(args.limit)).scalars().all()
+            cursor = keyset.next_cursor(previous, args.limit)
+            cursor_ms = time_page(db, keyset.apply(base, cursor).limit(args.limit), args.runs)
+            print(f"depth {depth:>9}   offset {offset_ms:>8.2f} ms   cursor {cursor_ms:>8.2f} ms")
+            depth *= 10
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""List-endpoint serialization cost of post_service's PostResponse.
+
+Serializes a page of posts the way FastAPI does for response_model=List[PostResponse]
+(validate from attributes, then dump to JSON) with the old PostResponse, which inherited
+PostBase and re-ran bleach.clean on every field of every item, and the current one, which
+trusts rows that were sanitized on write. Also times the write-side sanitizing of one page
+with bleach.clean per call against the cached Cleaner the request schemas now share.
+
+    python -m benchmarks.post_serialization --items 100 --runs 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, Optional
+
+import bleach
+from pydantic import BaseModel, TypeAdapter, field_validator
+
+def legacy_response():
+    # The pre-change PostResponse: PostBase's validators with a fresh bleach.clean per call
+    class LegacyPostBase(BaseModel):
+        content: str
+        job_title: str
+        skills: Optional[str] = None
+        experience_years: Optional[int] = None
+        is_open_to_work: Optional[bool] = True
+
+        @field_validator('content')
+        @classmethod
+        def sanitize_content(cls, v):
+            return bleach.clean(v, tags=['p', 'br', 'strong', 'em', 'u', 'ul', 'ol', 'li'], attributes={}, strip=True)
+
+        @field_validator('job_title')
+        @classmethod
+        def sanitize_job_title(cls, v):
+            return bleach.clean(v, tags=[], strip=True)
+
+        @field_validator('skills')
+        @classmethod
+        def sanitize_and_validate_skills(cls, v):
+            if v is not None:
+                skills_list = [skill.strip() for skill in bleach.clean(v, tags=[], strip=True).split(',')]
+                return ','.join([skill for skill in skills_list if skill])
+            return v
+
+    class LegacyPostResponse(LegacyPostBase):
+        id: int
+        user_id: int
+        resume_url: str
+        created_at: datetime
+        updated_at: Optional[datetime] = None
+
+        class Config:
+            from_attributes = True
+
+    return LegacyPostResponse
+
+def make_rows(items: int) -> list:
+    content = "<p>Backend engineer, <strong>8 years</strong> of Python and Postgres.</p>" * 10
+    return [
+        SimpleNamespace(
+            id=i, user_id=1, content=content, job_title="Senior Engineer", skills="python,sql,aws,docker",
+            experience_years=8, is_open_to_work=True, resume_url=f"https://example.com/resumes/{i}.pdf",
+            created_at=datetime(2024, 1, 1), updated_at=None,
+        )
+        for i in range(items)
+    ]
+
+def time_model(model, rows: list, runs: int) -> float:
+    adapter = TypeAdapter(List[model])
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        adapter.dump_json(adapter.validate_python(rows))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def time_calls(fn, calls: int, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "post_service"))
+    import schemas
+
+    rows = make_rows(args.items)
+    legacy = time_model(legacy_response(), rows, args.runs)
+    current = time_model(schemas.PostResponse, rows, args.runs)
+    print(f"{args.items} posts per page, median of {args.runs} runs")
+    print(f"legacy  (bleach per item) {legacy:>8.2f} ms")
+    print(f"current (trust stored)    {current:>8.2f} ms   {legacy / current:.0f}x faster")
+
+    content = rows[0].content
+    per_call = time_calls(lambda: bleach.clean(content, tags=['p', 'br', 'strong', 'em', 'u', 'ul', 'ol', 'li'], attributes={}, strip=True), args.items, args.runs)
+    cached = time_calls(lambda: schemas.CONTENT_CLEANER.clean(content), args.items, args.runs)
+    print(f"sanitize {args.items} contents: bleach.clean {per_call:.2f} ms, cached Cleaner {cached:.2f} ms")
+
+if __name__ == "__main__":
+    main()
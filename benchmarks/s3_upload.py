@@ -0,0 +1,92 @@
+"""Upload memory/time for S3Handler.upload_file against a local moto S3 server.
+
+Uploads a fake PDF of each size, checks the stored object's size and content type, and
+reports the Python heap peak during the upload (tracemalloc). moto runs in a subprocess
+so its own copy of the object isn't counted; the peak should stay near one multipart
+part no matter how large the file is.
+
+    python -m benchmarks.s3_upload --sizes-mb 1 20 100
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+from fastapi import UploadFile
+
+BUCKET = "bench-bucket"
+
+def fake_pdf(size: int) -> tempfile.SpooledTemporaryFile:
+    # Same spooling Starlette uses for multipart bodies
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spool.write(b"%PDF-1.4\n")
+    block = os.urandom(1024 * 1024)
+    while spool.tell() < size:
+        spool.write(block[: size - spool.tell()])
+    spool.seek(0)
+    return spool
+
+async def upload(handler, size: int) -> dict:
+    upload_file = UploadFile(file=fake_pdf(size), filename="resume.pdf")
+    tracemalloc.start()
+    start = time.perf_counter()
+    url = await handler.upload_file(upload_file, file_type="resume")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    key = url.split(".amazonaws.com/")[1]
+    stored = handler.s3_client.head_object(Bucket=BUCKET, Key=key)
+    assert stored["ContentLength"] == size, (stored["ContentLength"], size)
+    assert stored["ContentType"] == "application/pdf"
+    return {"seconds": elapsed, "peak_mb": peak / 1024 / 1024}
+
+def start_moto() -> tuple:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("moto server did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 20, 100])
+    args = parser.parse_args()
+
+    server, endpoint = start_moto()
+    os.environ["AWS_S3_ENDPOINT_URL"] = endpoint
+    os.environ["AWS_BUCKET_NAME"] = BUCKET
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+    try:
+        from shared.s3 import S3Handler
+
+        handler = S3Handler()
+        handler.s3_client.create_bucket(Bucket=BUCKET)
+        for size_mb in args.sizes_mb:
+            result = asyncio.run(upload(handler, size_mb * 1024 * 1024))
+            print(f"{size_mb:>5} MB  {result['seconds']:>7.2f} s  peak heap {result['peak_mb']:>7.1f} MB")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Fill the database with a realistic dataset for load testing.
+
+Users with bios, a long-tailed number of resume posts each (skills, experience, FTS-indexed
+text), and comment threads under them: rated top-level comments plus replies, all timestamped
+after their parent. Rows go in with COPY on Postgres and executemany on sqlite, ids assigned
+here so nothing has to be read back; post_skills and post_rating_stats are written alongside.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.seed --users 100000 --posts-per-user 5 --comments-per-post 8
+
+Every seeded user can log in as <username> with --password.
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+FIRST_NAMES = ["Ada", "Alan", "Grace", "Linus", "Margaret", "Dennis", "Barbara", "Ken", "Radia", "Guido",
+               "Frances", "Edsger", "Katherine", "Donald", "Hedy", "Tim", "Anita", "Bjarne", "Shafi", "John"]
+LAST_NAMES = ["Lovelace", "Turing", "Hopper", "Torvalds", "Hamilton", "Ritchie", "Liskov", "Thompson", "Perlman",
+              "van Rossum", "Allen", "Dijkstra", "Johnson", "Knuth", "Lamarr", "Berners-Lee", "Borg", "Stroustrup"]
+JOB_TITLES = ["Backend Engineer", "Frontend Developer", "Data Scientist", "DevOps Engineer", "Product Manager",
+              "Site Reliability Engineer", "Machine Learning Engineer", "Mobile Developer", "QA Engineer",
+              "Security Engineer", "Engineering Manager", "Full Stack Developer", "Data Engineer", "UX Designer"]
+SKILLS = ["python", "go", "rust", "java", "typescript", "react", "postgres", "redis", "kafka", "aws", "gcp",
+          "kubernetes", "docker", "terraform", "pytorch", "sql", "graphql", "spark", "airflow", "swift", "kotlin"]
+PHRASES = ["Shipped a payments platform handling millions of requests a day.",
+           "Led a migration from a monolith to services.", "Cut p99 latency in half by reworking the cache layer.",
+           "Mentored a team of five engineers.", "Built the data pipeline behind our recommendations.",
+           "Looking for a remote role on a small team.", "Open to contract work.",
+           "Maintainer of a popular open source library.", "Ran on-call for a 24/7 consumer product."]
+COMMENTS = ["Great profile!", "Impressive experience with {skill}.", "We're hiring for exactly this, DM me.",
+            "How did you approach the {skill} migration?", "Strong resume, maybe lead with the impact.",
+            "Would love to chat about a role on our team.", "Thanks for sharing!", "Agreed with the above."]
+
+def long_tail(rng: random.Random, mean: float) -> int:
+    # Pareto (alpha 1.5, mean 3) scaled to `mean`: most rows get a few children, a handful get a lot
+    value = rng.paretovariate(1.5) * mean / 3
+    return min(int(value + rng.random()), int(mean * 50) + 1)
+
+class Writer:
+    """Appends rows to tables in chunks: COPY ... FROM STDIN on Postgres, executemany otherwise"""
+
+    def __init__(self, engine, chunk_size: int):
+        self.engine = engine
+        self.postgres = engine.dialect.name == "postgresql"
+        self.chunk_size = chunk_size
+        self.counts: Dict[str, int] = {}
+
+    def _value(self, value):
+        if isinstance(value, datetime):
+            # Same text CURRENT_TIMESTAMP produces on sqlite, so seeded rows sort/page like real ones
+            text = value.strftime("%Y-%m-%d %H:%M:%S")
+            return text + "+00" if self.postgres else text
+        return value
+
+    def write(self, table: str, columns: Sequence[str], rows: Iterable[Sequence]):
+        chunk = []
+        for row in rows:
+            chunk.append([self._value(value) for value in row])
+            if len(chunk) >= self.chunk_size:
+                self._flush(table, columns, chunk)
+                chunk = []
+        if chunk:
+            self._flush(table, columns, chunk)
+
+    def _flush(self, table: str, columns: Sequence[str], chunk: List[list]):
+        with self.engine.begin() as conn:
+            if self.postgres:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(chunk)
+                buffer.seek(0)
+                with conn.connection.driver_connection.cursor() as cursor:
+                    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:
+                placeholders = ", ".join("?" for _ in columns)
+                conn.exec_driver_sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", [tuple(row) for row in chunk])
+        self.counts[table] = self.counts.get(table, 0) + len(chunk)
+
+    def reset_sequences(self, tables: Iterable[str]):
+        # Ids were assigned here; move the serial sequences past them
+        if not self.postgres:
+            return
+        with self.engine.begin() as conn:
+            for table in tables:
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+                )
+
+def next_id(engine, table: str) -> int:
+    with engine.connect() as conn:
+        return (conn.exec_driver_sql(f"SELECT MAX(id) FROM {table}").scalar() or 0) + 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts-per-user", type=float, default=3, help="mean, long-tailed")
+    parser.add_argument("--comments-per-post", type=float, default=6, help="mean top-level comments, long-tailed")
+    parser.add_argument("--reply-ratio", type=float, default=0.5, help="mean replies per top-level comment")
+    parser.add_argument("--days", type=int, default=365, help="spread created_at over this many days")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from passlib.context import CryptContext
+    from shared.database import get_engine
+    from shared.migrate import migrate
+
+    migrate()
+    engine = get_engine()
+
+    rng = random.Random(args.seed)
+    writer = Writer(engine, args.chunk_size)
+    # One hash for everyone: bcrypt per user would dominate the run
+    hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash(args.password)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    start_time = now - timedelta(days=args.days)
+    first_user, first_post, first_comment = next_id(engine, "users"), next_id(engine, "posts"), next_id(engine, "comments")
+    stats: Dict[int, List[int]] = {}  # post_id -> rating_sum, rating_count, stars_1..5, reply_count
+    started = time.perf_counter()
+
+    def random_time(after: datetime) -> datetime:
+        span = max(int((now - after).total_seconds()), 1)
+        return after + timedelta(seconds=rng.randrange(span))
+
+    users = []  # (id, created_at)
+    def user_rows() -> Iterator[tuple]:
+        for user_id in range(first_user, first_user + args.users):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            username = f"{first}{last}{user_id}".lower().replace(" ", "").replace("-", "")
+            created_at = random_time(start_time)
+            users.append((user_id, created_at))
+            yield (user_id, f"{username}@example.com", username, hashed_password, f"{first} {last}",
+                   rng.choice(PHRASES), True, created_at)
+
+    writer.write("users", ["id", "email", "username", "hashed_password", "full_name", "bio", "is_active", "created_at"], user_rows())
+
+    posts = []  # (id, created_at, skills)
+    def post_rows() -> Iterator[tuple]:
+        post_id = first_post
+        for user_id, joined in users:
+            for _ in range(long_tail(rng, args.posts_per_user)):
+                skills = rng.sample(SKILLS, rng.randint(1, 6))
+                content = " ".join(rng.sample(PHRASES, rng.randint(2, 5)))
+                created_at = random_time(joined)
+                posts.append((post_id, created_at, skills))
+                yield (post_id, user_id, f"<p>{content}</p>", f"https://resumes.example.com/resume/{post_id}.pdf",
+                       rng.choice(JOB_TITLES), ",".join(skills), rng.randint(0, 30), rng.random() < 0.6, created_at)
+                post_id += 1
+
+    writer.write("posts", ["id", "user_id", "content", "resume_url", "job_title", "skills", "experience_years", "is_open_to_work", "created_at"], post_rows())
+    writer.write("post_skills", ["post_id", "skill"], ((post_id, skill) for post_id, _, skills in posts for skill in skills))
+
+    def comment_rows() -> Iterator[tuple]:
+        comment_id = first_comment
+        for post_id, posted, skills in posts:
+            totals = stats[post_id] = [0] * 8
+            for _ in range(long_tail(rng, args.comments_per_post)):
+                # Ratings skew positive, like real ones
+                rating = rng.choices(range(1, 6), weights=(5, 7, 15, 33, 40))[0]
+                created_at = random_time(posted)
+                top_id = comment_id
+                yield (comment_id, first_user + rng.randrange(args.users), post_id,
+                       rng.choice(COMMENTS).format(skill=rng.choice(skills)), rating, None, created_at)
+                comment_id += 1
+                totals[0] += rating
+                totals[1] += 1
+                totals[1 + rating] += 1
+                for _ in range(long_tail(rng, args.reply_ratio)):
+                    yield (comment_id, first_user + rng.randrange(args.users), post_id,
+                           rng.choice(COMMENTS).format(skill=rng.choice(skills)), None, top_id, random_time(created_at))
+                    comment_id += 1
+                    totals[7] += 1
+
+    writer.write("comments", ["id", "user_id", "post_id", "content", "rating", "parent_id", "created_at"], comment_rows())
+    writer.write(
+        "post_rating_stats",
+        ["post_id", "rating_sum", "rating_count", "stars_1", "stars_2", "stars_3", "stars_4", "stars_5", "reply_count"],
+        ((post_id, *totals) for post_id, totals in stats.items() if any(totals)),
+    )
+    writer.reset_sequences(["users", "posts", "comments"])
+
+    elapsed = time.perf_counter() - started
+    total = sum(writer.counts.values())
+    for table, count in writer.counts.items():
+        print(f"{table:<20} {count:>12,}")
+    print(f"{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s); log in with password {args.password!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from benchmarks.s3_upload import start_moto
+from benchmarks.suite import __doc__ as suite_doc
+from benchmarks.suite import apps
+
+async def run(args) -> dict:
+    from benchmarks.suite import scenarios
+    from benchmarks.suite.report import Recorder, run_metadata
+
+    recorder = Recorder()
+    async with apps.Services(rate_limits=args.rate_limits) as services:
+        world = scenarios.World(services, recorder, random.Random(args.seed))
+        await scenarios.populate(world, args.users, args.posts, args.comments)
+
+        recorder.start()
+        deadline = time.perf_counter() + args.duration
+        per_worker = -(-args.requests // args.concurrency) if args.requests else None
+        await asyncio.gather(*[
+            scenarios.worker(world, random.Random(args.seed * 1000 + n), deadline, per_worker)
+            for n in range(args.concurrency)
+        ])
+        recorder.stop()
+
+        from shared.database import get_async_engine
+        return recorder.report(run_metadata(
+            database=get_async_engine().dialect.name,
+            concurrency=args.concurrency,
+            seed=args.seed,
+            users=args.users,
+            posts=args.posts,
+            comments=args.comments,
+            mix={action.__name__: weight for action, weight in scenarios.MIX.items()},
+        ))
+
+def main():
+    parser = argparse.ArgumentParser(description=suite_doc.splitlines()[0], epilog=suite_doc, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many actions instead")
+    parser.add_argument("--concurrency", type=int, default=20, help="simulated users acting at once")
+    parser.add_argument("--users", type=int, default=50, help="accounts created before measuring")
+    parser.add_argument("--posts", type=int, default=2000, help="posts bulk-imported before measuring")
+    parser.add_argument("--comments", type=int, default=5000, help="comments bulk-imported before measuring")
+    parser.add_argument("--database-url", default=None, help="default: a fresh sqlite file")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="production uses 12; low keeps signups from dominating")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the per-client rate limits (all traffic is one client)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="JSON report of an earlier run to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p95/throughput change that counts as a regression")
+    args = parser.parse_args()
+    if args.requests:
+        args.duration = float("inf")
+
+    server, endpoint = start_moto()
+    try:
+        apps.configure(args.database_url, endpoint, args.bcrypt_rounds)
+        report = asyncio.run(run(args))
+    finally:
+        server.terminate()
+
+    from benchmarks.suite.report import compare, print_report
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.output}")
+    if args.compare and compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Per-route latency recording, summaries and run-to-run comparison"""
+import json
+import math
+import platform
+import subprocess
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest rank, so p99 of a small sample is an observed value rather than an interpolation
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+class Recorder:
+    """Latencies keyed by "<service> <METHOD> <route template>"; anything but 2xx/3xx is an error"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.started = self.finished = None
+
+    def start(self):
+        self.latencies.clear()
+        self.errors.clear()
+        self.statuses.clear()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def record(self, route: str, status: int, seconds: float):
+        if self.started is None:
+            return  # warm-up
+        self.latencies[route].append(seconds)
+        self.statuses[route][status] += 1
+        if status >= 400:
+            self.errors[route] += 1
+
+    def report(self, meta: dict) -> dict:
+        seconds = (self.finished or time.perf_counter()) - self.started
+        everything = [value for values in self.latencies.values() for value in values]
+        return {
+            "meta": {**meta, "duration_s": round(seconds, 3)},
+            "total": summarize(everything, sum(self.errors.values()), seconds),
+            "routes": {
+                route: {**summarize(values, self.errors[route], seconds), "statuses": dict(self.statuses[route])}
+                for route, values in sorted(self.latencies.items())
+            },
+        }
+
+def run_metadata(**options) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **options,
+    }
+
+def print_report(report: dict):
+    print(f"{'route':<52} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in list(report["routes"].items()) + [("TOTAL", report["total"])]:
+        print(f"{route:<52} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+def compare(report: dict, baseline_path: str, threshold: float) -> bool:
+    """Print per-route changes against a previous run; True if any route regressed past `threshold`"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressed = False
+    print(f"\nvs {baseline_path} (commit {baseline['meta'].get('commit')}), regression threshold {threshold:.0%}")
+    for key in ("database", "concurrency", "users", "posts", "comments", "mix"):
+        if baseline["meta"].get(key) != report["meta"].get(key):
+            print(f"warning: {key} differs from the baseline run, numbers are not comparable")
+    for route, stats in list(report["routes"].items()) + [("TOTAL", report["total"])]:
+        before: Optional[dict] = baseline["total"] if route == "TOTAL" else baseline["routes"].get(route)
+        if not before or not before["requests"]:
+            print(f"{route:<52} new")
+            continue
+        p95 = stats["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps = stats["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        flag = ""
+        # Per-route throughput just follows the mix, so only the total's counts
+        if p95 > threshold or (route == "TOTAL" and rps < -threshold):
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{route:<52} p95 {p95:>+7.1%}   throughput {rps:>+7.1%}{flag}")
+    return regressed
@@ -0,0 +1,189 @@
+"""The traffic mix: weighted user actions against the in-process services"""
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.suite.apps import IMPORT_KEY, Services
+from benchmarks.suite.report import Recorder
+
+PASSWORD = "Bench-passw0rd!"
+JOB_TITLES = ["Backend Engineer", "Data Scientist", "DevOps Engineer", "Frontend Developer", "Product Manager"]
+SKILLS = ["python", "go", "rust", "react", "postgres", "kafka", "aws", "kubernetes", "docker", "sql"]
+WORDS = ["payments", "latency", "migration", "pipeline", "mentored", "remote", "platform", "cache", "oncall"]
+
+class World:
+    """What the simulated users know about: accounts, posts and top-level comments created so far"""
+
+    def __init__(self, services: Services, recorder: Recorder, rng: random.Random):
+        self.services = services
+        self.recorder = recorder
+        self.rng = rng
+        self.users: List[Tuple[int, str]] = []  # (user_id, bearer token)
+        self.posts: List[int] = []
+        self.comments: List[Tuple[int, int]] = []  # (post_id, top-level comment id)
+        self.counter = 0
+
+    async def call(self, service: str, method: str, route: str, path: Optional[str] = None, **kwargs):
+        """One request, recorded under its route template"""
+        start = time.perf_counter()
+        response = await self.services.clients[service].request(method, path or route, **kwargs)
+        self.recorder.record(f"{service} {method} {route}", response.status_code, time.perf_counter() - start)
+        return response
+
+    def next_id(self) -> int:
+        self.counter += 1
+        return self.counter
+
+    def auth(self) -> dict:
+        _, token = self.rng.choice(self.users)
+        return {"Authorization": f"Bearer {token}"}
+
+    def text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+async def signup_login(world: World):
+    n = world.next_id()
+    email = f"bench{n}-{os.getpid()}-{world.rng.randrange(10 ** 9)}@example.com"
+    response = await world.call("user", "POST", "/users/", json={
+        "email": email, "username": email.split("@")[0], "password": PASSWORD, "full_name": "Bench User",
+    })
+    if response.status_code != 200:
+        return
+    user_id = response.json()["id"]
+    response = await world.call("user", "POST", "/users/login", json={"email": email, "password": PASSWORD})
+    if response.status_code == 200:
+        world.users.append((user_id, response.json()["access_token"]))
+
+async def view_profile(world: World):
+    user_id, _ = world.rng.choice(world.users)
+    await world.call("user", "GET", "/users/{user_id}", f"/users/{user_id}")
+
+async def create_post(world: World):
+    # Random bytes, so most uploads are new objects rather than content-addressed hits
+    pdf = b"%PDF-1.4\n" + os.urandom(world.rng.randrange(2_000, 50_000))
+    response = await world.call(
+        "post", "POST", "/posts/",
+        params={"content": world.text(30), "job_title": world.rng.choice(JOB_TITLES)},
+        files={"resume_file": ("resume.pdf", pdf, "application/pdf")},
+        headers=world.auth(),
+    )
+    if response.status_code == 200:
+        world.posts.append(response.json()["id"])
+
+async def view_post(world: World):
+    post_id = world.rng.choice(world.posts)
+    # Mostly signed-in readers, so unique-viewer tracking sees user ids
+    headers = world.auth() if world.rng.random() < 0.8 else {}
+    await world.call("post", "GET", "/posts/{post_id}", f"/posts/{post_id}", headers=headers)
+
+async def search_posts(world: World):
+    roll = world.rng.random()
+    if roll < 0.4:
+        params = {"q": world.rng.choice(WORDS)}
+    elif roll < 0.7:
+        params = {"skills": ",".join(world.rng.sample(SKILLS, 2))}
+    else:
+        params = {"job_title": world.rng.choice(JOB_TITLES).split()[0], "open_to_work": "true"}
+    await world.call("post", "GET", "/posts/search/", params=params)
+
+async def user_posts(world: World):
+    user_id, _ = world.rng.choice(world.users)
+    await world.call("post", "GET", "/posts/user/{user_id}", f"/posts/user/{user_id}")
+
+async def comment(world: World):
+    if world.comments and world.rng.random() < 0.4:
+        post_id, parent_id = world.rng.choice(world.comments)
+        body = {"content": world.text(12), "post_id": post_id, "parent_id": parent_id}
+    else:
+        post_id = world.rng.choice(world.posts)
+        body = {"content": world.text(12), "post_id": post_id, "rating": world.rng.randint(1, 5)}
+    response = await world.call("comment", "POST", "/comments/", json=body, headers=world.auth())
+    if response.status_code == 200 and "rating" in body:
+        world.comments.append((post_id, response.json()["id"]))
+
+async def read_thread(world: World):
+    post_id = world.rng.choice(world.posts)
+    response = await world.call("comment", "GET", "/comments/post/{post_id}/thread", f"/comments/post/{post_id}/thread")
+    cursor = response.headers.get("x-next-cursor")
+    if cursor and world.rng.random() < 0.3:
+        await world.call("comment", "GET", "/comments/post/{post_id}/thread", f"/comments/post/{post_id}/thread", params={"cursor": cursor})
+
+async def read_comments(world: World):
+    post_id = world.rng.choice(world.posts)
+    await world.call("comment", "GET", "/comments/post/{post_id}", f"/comments/post/{post_id}")
+    await world.call("comment", "GET", "/comments/average-rating/{post_id}", f"/comments/average-rating/{post_id}")
+
+async def ingest_events(world: World):
+    # What a busy client-side tracker would send in one flush
+    events = []
+    for _ in range(200):
+        user_id, _ = world.rng.choice(world.users)
+        if world.rng.random() < 0.7:
+            events.append({"event_type": "post_view", "post_id": world.rng.choice(world.posts), "user_id": user_id})
+        else:
+            events.append({"event_type": "like", "content_type": "post", "post_id": world.rng.choice(world.posts)})
+    await world.call("analytics", "POST", "/events/batch", json=events)
+
+async def read_analytics(world: World):
+    if world.rng.random() < 0.5:
+        await world.call("analytics", "GET", "/analytics/active-users")
+    else:
+        end = time.time()
+        await world.call("analytics", "GET", "/analytics/series", params={
+            "metric": "post_views", "start": end - 3600, "end": end, "resolution": "minute",
+        })
+
+# Relative weights of each action in the mix
+MIX: Dict[Callable, float] = {
+    signup_login: 1,
+    view_profile: 2,
+    create_post: 2,
+    view_post: 12,
+    search_posts: 6,
+    user_posts: 3,
+    comment: 4,
+    read_thread: 6,
+    read_comments: 3,
+    ingest_events: 1,
+    read_analytics: 1,
+}
+
+async def populate(world: World, users: int, posts: int, comments: int):
+    """Starting data: accounts through the API, posts and comments through the bulk import endpoints"""
+    for _ in range(users):
+        await signup_login(world)
+    if not world.users:
+        raise RuntimeError("no accounts could be created; check the user service")
+    headers = {"X-Import-Key": IMPORT_KEY}
+    rng = world.rng
+    for offset in range(0, posts, 1000):
+        items = [{
+            "content": f"<p>{world.text(40)}</p>",
+            "job_title": rng.choice(JOB_TITLES),
+            "skills": ",".join(rng.sample(SKILLS, rng.randint(1, 4))),
+            "experience_years": rng.randint(0, 25),
+            "is_open_to_work": rng.random() < 0.6,
+            "user_id": rng.choice(world.users)[0],
+            "resume_url": f"https://{os.environ['AWS_BUCKET_NAME']}.s3.amazonaws.com/resume/seed-{offset + i}.pdf",
+        } for i in range(min(1000, posts - offset))]
+        response = await world.call("post", "POST", "/posts/bulk", json={"items": items}, headers=headers)
+        response.raise_for_status()
+        world.posts.extend(response.json()["ids"])
+    for offset in range(0, comments, 1000):
+        items = []
+        for _ in range(min(1000, comments - offset)):
+            item = {"content": world.text(10), "post_id": rng.choice(world.posts), "user_id": rng.choice(world.users)[0]}
+            item["rating"] = rng.randint(1, 5)
+            items.append(item)
+        response = await world.call("comment", "POST", "/comments/bulk", json={"items": items}, headers=headers)
+        response.raise_for_status()
+        world.comments.extend(zip((item["post_id"] for item in items), response.json()["ids"]))
+
+async def worker(world: World, rng: random.Random, deadline: float, max_actions: Optional[int]):
+    actions, weights = list(MIX), list(MIX.values())
+    done = 0
+    while time.perf_counter() < deadline and (max_actions is None or done < max_actions):
+        action = rng.choices(actions, weights)[0]
+        await action(world)
+        done += 1
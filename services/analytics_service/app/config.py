@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,4 +9,7 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
-settings = Settings() 
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    # Read on startup (lifespan), not import
+    return Settings()
@@ -0,0 +1,70 @@
+from collections import Counter
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import Annotated, List, Literal, Optional, Union
+from metrics import posts_created, post_views, likes_total, comments_total, error_count
+
+MAX_BATCH_EVENTS = 10000
+
+class UserActivityEvent(BaseModel):
+    event_type: Literal["login", "logout"]
+    user_id: Optional[int] = None
+
+class ContentEvent(BaseModel):
+    event_type: Literal["post_created", "like", "comment"]
+    content_type: Optional[str] = None
+    post_id: Optional[int] = None
+
+class ErrorEvent(BaseModel):
+    event_type: Literal["error"]
+    service: str
+    error_type: str
+
+class PostViewEvent(BaseModel):
+    event_type: Literal["post_view"]
+    post_id: int
+    user_id: Optional[int] = None  # anonymous views count towards post_views only
+
+class RequestEvent(BaseModel):
+    event_type: Literal["request"]
+    service: str
+    route: str
+    duration_ms: float = Field(..., ge=0)
+
+Event = Annotated[Union[UserActivityEvent, ContentEvent, PostViewEvent, ErrorEvent, RequestEvent], Field(discriminator="event_type")]
+events_adapter = TypeAdapter(List[Event])
+
+def parse_batch(body: bytes, ndjson: bool) -> List[Event]:
+    """Validate a JSON array or NDJSON body in one pydantic-core pass (raises ValidationError)"""
+    if ndjson:
+        lines = [line for line in body.splitlines() if line.strip()]
+        body = b"[" + b",".join(lines) + b"]"
+    return events_adapter.validate_json(body)
+
+def apply_events(events: List[Event]) -> dict:
+    """Fold the batch into per-label totals, then touch each metric once (active users are in uniques.py)"""
+    comments = views = 0
+    posts, likes, errors = Counter(), Counter(), Counter()
+    for event in events:
+        event_type = event.event_type
+        if event_type == "post_created":
+            posts[event.content_type] += 1
+        elif event_type == "like":
+            likes[event.content_type] += 1
+        elif event_type == "comment":
+            comments += 1
+        elif event_type == "post_view":
+            views += 1
+        elif event_type == "error":
+            errors[(event.service, event.error_type)] += 1
+
+    for content_type, count in posts.items():
+        posts_created.labels(post_type=content_type).inc(count)
+    for content_type, count in likes.items():
+        likes_total.labels(content_type=content_type).inc(count)
+    if comments:
+        comments_total.inc(comments)
+    if views:
+        post_views.inc(views)
+    for (service, error_type), count in errors.items():
+        error_count.labels(service=service, error_type=error_type).inc(count)
+    return {"status": "success", "accepted": len(events)}
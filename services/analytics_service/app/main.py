@@ -1,11 +1,61 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from pydantic import ValidationError
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
+import asyncio
+import base64
+import os
+import time
+
+import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from fastapi.responses import Response
-from metrics import MetricsMiddleware, active_users, posts_created, likes_total, comments_total, error_count
-from config import settings
+from metrics import daily_active_users, weekly_active_users, monthly_active_users
+from events import MAX_BATCH_EVENTS, ContentEvent, ErrorEvent, UserActivityEvent, apply_events, parse_batch
+from rollups import HOUR, MINUTE, RollupStore
+from uniques import ACTIVE_USERS_PRECISION, UniqueCounter, estimate
+from config import get_settings
+from shared.metrics import MetricsMiddleware
+
+ROLLUP_COMPACT_INTERVAL = 60  # seconds
+MAX_SERIES_BUCKETS = 5000
+
+rollup_store: Optional[RollupStore] = None
+unique_counter: Optional[UniqueCounter] = None
+
+async def maintain_rollups():
+    while True:
+        await asyncio.sleep(ROLLUP_COMPACT_INTERVAL)
+        rollup_store.compact(time.time())
+        rollup_store.flush()
+        unique_counter.flush()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global rollup_store, unique_counter
+    get_settings()  # fail fast on missing configuration
+    rollup_store = RollupStore(
+        os.getenv("ROLLUP_DIR", "data/rollups"),
+        max_series=int(os.getenv("ROLLUP_MAX_SERIES", "4096")),
+        max_post_series=int(os.environ["ROLLUP_MAX_POST_SERIES"]) if os.getenv("ROLLUP_MAX_POST_SERIES") else None,
+    )
+    rollup_store.compact(time.time())
+    unique_counter = UniqueCounter(
+        os.path.join(os.getenv("ROLLUP_DIR", "data/rollups"), "uniques"),
+        max_posts=int(os.getenv("UNIQUE_VIEWERS_MAX_POSTS", "10000")),
+    )
+    daily_active_users.set_function(lambda: unique_counter.active_users(1, time.time()))
+    weekly_active_users.set_function(lambda: unique_counter.active_users(7, time.time()))
+    monthly_active_users.set_function(lambda: unique_counter.active_users(30, time.time()))
+    task = asyncio.create_task(maintain_rollups())
+    yield
+    task.cancel()
+    rollup_store.flush()
+    unique_counter.flush()
 
-app = FastAPI(title="Analytics Service")
+app = FastAPI(title="Analytics Service", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -17,53 +67,140 @@ app.add_middleware(
 )
 
 # Add metrics middleware
-app.middleware("http")(MetricsMiddleware())
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/metrics")
 async def get_metrics():
     """Endpoint for Prometheus to scrape metrics"""
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
+def ingest(events, now: float) -> dict:
+    rollup_store.ingest(events, now)
+    unique_counter.ingest(events, now)
+    return apply_events(events)
+
+def parse_event(model, data) -> list:
+    try:
+        return [model.model_validate(data)]
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+
+# Single-event endpoints from before /events/batch; they go through the same ingest path
+
 @app.post("/events/user-activity")
 async def track_user_activity(request: Request):
     """Track user activity events"""
-    data = await request.json()
-    event_type = data.get("event_type")
-    
-    if event_type == "login":
-        active_users.inc()
-    elif event_type == "logout":
-        active_users.dec()
-    
-    return {"status": "success"}
+    return ingest(parse_event(UserActivityEvent, await request.json()), time.time())
 
 @app.post("/events/content")
 async def track_content_events(request: Request):
     """Track content-related events"""
-    data = await request.json()
-    event_type = data.get("event_type")
-    content_type = data.get("content_type")
-    
-    if event_type == "post_created":
-        posts_created.labels(post_type=content_type).inc()
-    elif event_type == "like":
-        likes_total.labels(content_type=content_type).inc()
-    elif event_type == "comment":
-        comments_total.inc()
-    
-    return {"status": "success"}
+    return ingest(parse_event(ContentEvent, await request.json()), time.time())
 
 @app.post("/events/error")
 async def track_error_events(request: Request):
     """Track error events"""
     data = await request.json()
-    service = data.get("service")
-    error_type = data.get("error_type")
-    
-    error_count.labels(service=service, error_type=error_type).inc()
-    return {"status": "success"}
+    if isinstance(data, dict):
+        data = {**data, "event_type": "error"}  # senders never included one here
+    return ingest(parse_event(ErrorEvent, data), time.time())
+
+@app.post("/events/batch")
+async def track_events_batch(request: Request):
+    """Track many events at once, as a JSON array or NDJSON (one event per line)"""
+    body = await request.body()
+    ndjson = "ndjson" in request.headers.get("content-type", "") or not body.lstrip().startswith(b"[")
+    try:
+        events = parse_batch(body, ndjson)
+    except ValidationError as e:
+        # The whole batch is rejected so a sender can fix and resend it as a unit
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    if len(events) > MAX_BATCH_EVENTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_EVENTS} events per batch")
+    return ingest(events, time.time())
+
+@app.get("/analytics/active-users")
+async def get_active_users():
+    """Distinct active users over rolling windows (HyperLogLog estimates, ~1% error)"""
+    now = time.time()
+    return {
+        "dau": unique_counter.active_users(1, now),
+        "wau": unique_counter.active_users(7, now),
+        "mau": unique_counter.active_users(30, now),
+    }
+
+@app.get("/analytics/active-users/sketch")
+async def get_active_users_sketch(days: int = Query(1, ge=1, le=30)):
+    """Raw sketch for the window, so sketches from several replicas can be merged"""
+    registers = unique_counter.active_sketch(days, time.time())
+    return {"precision": ACTIVE_USERS_PRECISION, "days": days, "registers": base64.b64encode(registers.tobytes()).decode()}
+
+@app.post("/analytics/active-users/merge")
+async def merge_active_users_sketches(sketches: List[str]):
+    """Distinct users across replicas: the estimate of the register-wise max of their sketches"""
+    size = 1 << ACTIVE_USERS_PRECISION
+    merged = np.zeros(size, dtype=np.uint8)
+    for sketch in sketches:
+        try:
+            registers = np.frombuffer(base64.b64decode(sketch), dtype=np.uint8)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Sketches must be base64")
+        if len(registers) != size:
+            raise HTTPException(status_code=400, detail=f"Sketches must have {size} registers")
+        np.maximum(merged, registers, out=merged)
+    return {"unique_users": estimate(merged)}
+
+@app.get("/analytics/posts/{post_id}/unique-viewers")
+async def get_post_unique_viewers(post_id: int):
+    return {"post_id": post_id, "unique_viewers": unique_counter.post_viewers(post_id)}
+
+@app.get("/analytics/series")
+async def get_series(
+    metric: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[Literal["minute", "hour"]] = None,
+    group_by: Optional[str] = Query(None, description="Comma-separated label names, e.g. post_id"),
+    filter: List[str] = Query([], description="label:value, repeatable"),
+    quantiles: Optional[str] = Query(None, description="e.g. 0.5,0.95,0.99 for latency metrics"),
+):
+    """Rolled-up event counts (or latency quantiles) over time, e.g. comments per post per hour"""
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        quantile_list = [float(q) for q in quantiles.split(",")] if quantiles else None
+        filters = dict(item.split(":", 1) for item in filter)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Quantiles are numbers, filters look like label:value")
+    if quantile_list and not all(0 <= q <= 1 for q in quantile_list):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    if quantile_list or resolution is None:
+        # Sketches are hourly; counts use minutes for short ranges
+        resolution = "hour" if quantile_list or end - start > timedelta(hours=6) else "minute"
+    width = MINUTE if resolution == "minute" else HOUR
+    if (end - start).total_seconds() / width > MAX_SERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SERIES_BUCKETS} buckets per query")
+
+    return rollup_store.query(
+        metric,
+        start.timestamp(),
+        end.timestamp(),
+        resolution,
+        filters=filters,
+        group_by=[label for label in group_by.split(",") if label] if group_by else None,
+        quantiles=quantile_list,
+    )
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness():
+    """Ready once the rollup and unique-user stores are loaded"""
+    if rollup_store is None or unique_counter is None:
+        raise HTTPException(status_code=503, detail="starting")
+    return {"status": "ready"}
\ No newline at end of file
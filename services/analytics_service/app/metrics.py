@@ -1,5 +1,4 @@
-from prometheus_client import Counter, Histogram, Gauge
-import time
+from prometheus_client import Counter, Gauge
 
 # User metrics
 user_registrations = Counter(
@@ -7,9 +6,20 @@ user_registrations = Counter(
     'Total number of user registrations'
 )
 
-active_users = Gauge(
-    'active_users',
-    'Number of currently active users'
+# Unique users, estimated from HyperLogLog sketches (uniques.py) when scraped
+daily_active_users = Gauge(
+    'daily_active_users',
+    'Distinct users active today (UTC)'
+)
+
+weekly_active_users = Gauge(
+    'weekly_active_users',
+    'Distinct users active over the last 7 days'
+)
+
+monthly_active_users = Gauge(
+    'monthly_active_users',
+    'Distinct users active over the last 30 days'
 )
 
 # Post metrics
@@ -36,34 +46,25 @@ comments_total = Counter(
     'Total number of comments'
 )
 
-# Performance metrics
-request_latency = Histogram(
-    'request_latency_seconds',
-    'Request latency in seconds',
-    ['endpoint', 'method']
-)
-
+# Error metrics
 error_count = Counter(
     'error_count_total',
     'Total number of errors',
     ['service', 'error_type']
 )
 
-# System metrics
-db_connection_pool = Gauge(
-    'db_connection_pool_size',
-    'Current size of the database connection pool'
+# Rollup and unique-count capacity (rollups.py, uniques.py)
+rollup_series_dropped = Counter(
+    'analytics_rollup_series_dropped_total',
+    'Events not rolled up because every series row was taken'
+)
+
+rollup_series_evicted = Counter(
+    'analytics_rollup_series_evicted_total',
+    'Per-post series replaced by a newer post once the per-post cap was reached'
 )
 
-class MetricsMiddleware:
-    async def __call__(self, request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        duration = time.time() - start_time
-        
-        request_latency.labels(
-            endpoint=request.url.path,
-            method=request.method
-        ).observe(duration)
-        
-        return response 
\ No newline at end of file
+unique_viewers_evicted = Counter(
+    'analytics_unique_viewers_evicted_total',
+    'Post viewer sketches dropped for a newer post once UNIQUE_VIEWERS_MAX_POSTS were tracked'
+)
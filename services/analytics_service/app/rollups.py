@@ -0,0 +1,331 @@
+"""Embedded time-bucketed rollups of analytics events.
+
+Every series (metric + labels) gets a row in fixed-size ring buffers of time buckets, stored
+in memory-mapped numpy arrays so a restart picks up where it left off:
+
+  counts at minute resolution (last day), compacted into hour buckets (last ~90 days)
+  latency DDSketches at hour resolution (last week), mergeable across hours and series
+
+All series of a resolution share one time axis, so moving to a new bucket zeroes a single
+column for everyone. Queries sum rows per group-by key and pick whichever resolution fits.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+from metrics import rollup_series_dropped, rollup_series_evicted
+
+logger = logging.getLogger(__name__)
+
+MINUTE, HOUR = 60, 3600
+
+# DDSketch over milliseconds: bins grow geometrically, so any quantile is within ALPHA of the truth
+SKETCH_ALPHA = 0.02
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+SKETCH_MIN_MS = 0.01
+SKETCH_MAX_MS = 60_000.0
+SKETCH_BINS = math.ceil(math.log(SKETCH_MAX_MS / SKETCH_MIN_MS) / math.log(SKETCH_GAMMA)) + 1
+
+def sketch_bins(values_ms: np.ndarray) -> np.ndarray:
+    values = np.clip(np.asarray(values_ms, dtype=np.float64), SKETCH_MIN_MS, SKETCH_MAX_MS)
+    return np.ceil(np.log(values / SKETCH_MIN_MS) / math.log(SKETCH_GAMMA)).astype(np.int64)
+
+def sketch_quantile(counts: np.ndarray, q: float) -> Optional[float]:
+    total = counts.sum()
+    if total == 0:
+        return None
+    index = int(np.searchsorted(np.cumsum(counts), q * (total - 1) + 1))
+    # Midpoint of the bin in the relative-error sense
+    return SKETCH_MIN_MS * SKETCH_GAMMA ** index * 2 / (1 + SKETCH_GAMMA)
+
+class Ring:
+    """Time buckets of `width` seconds for up to `max_series` rows, `slots` buckets deep"""
+
+    def __init__(self, path: str, width: int, slots: int, max_series: int, dtype, cell: Tuple[int, ...] = ()):
+        self.width = width
+        self.slots = slots
+        # Slot-major, so starting a new bucket zeroes one contiguous block
+        shape = (slots, max_series) + cell
+        fresh = not os.path.exists(path + ".dat")
+        mode = "w+" if fresh else "r+"
+        self.values = np.memmap(path + ".dat", dtype=dtype, mode=mode, shape=shape)
+        self.stamps = np.memmap(path + ".stamps", dtype=np.int64, mode=mode, shape=(slots,))
+        if fresh:
+            self.stamps[:] = -1  # bucket number held by each slot
+
+    def bucket(self, ts: float) -> int:
+        return int(ts // self.width)
+
+    def column(self, bucket: int) -> int:
+        """Slot for `bucket`, recycling it (for every series at once) if it held an older bucket"""
+        slot = bucket % self.slots
+        if self.stamps[slot] != bucket:
+            self.values[slot] = 0
+            self.stamps[slot] = bucket
+        return slot
+
+    def read(self, rows: Sequence[int], first: int, last: int) -> np.ndarray:
+        """(bucket, row) values for buckets first..last; buckets no longer (or not yet) held read as zero"""
+        buckets = np.arange(first, last + 1)
+        slots = buckets % self.slots
+        data = np.array(self.values[np.ix_(slots, rows)])
+        data[self.stamps[slots] != buckets] = 0
+        return data
+
+    def flush(self):
+        self.values.flush()
+        self.stamps.flush()
+
+class SeriesIndex:
+    """(metric, labels) -> row of a ring, with the hour each series was last written.
+
+    Rows idle for longer than `retention` hours hold nothing any ring still keeps, so they are
+    handed out again. Per-post series (a post_id label) are capped at `post_limit` rows and
+    beyond that replace the least recently written post, so they can't crowd out the rest.
+    """
+
+    def __init__(self, limit: int, post_limit: int, retention: int, entries=(), default_hour: int = -1):
+        self.limit = limit
+        self.post_limit = post_limit
+        self.retention = retention
+        self.rows: Dict[Tuple[str, Tuple], int] = {}
+        self.last_hour: Dict[Tuple[str, Tuple], int] = {}
+        for entry in entries:
+            key = (entry[0], tuple(map(tuple, entry[1])))
+            self.rows[key] = entry[2]
+            self.last_hour[key] = entry[3] if len(entry) > 3 else default_hour  # older series.json
+        used = set(self.rows.values())
+        self.free = [row for row in range(limit - 1, -1, -1) if row not in used]
+        self.post_series = sum(1 for key in self.rows if _per_post(key))
+        self.reclaimed_at = -1
+
+    def items(self):
+        return self.rows.items()
+
+    def entries(self) -> list:
+        return [[metric, labels, row, self.last_hour[(metric, labels)]] for (metric, labels), row in self.rows.items()]
+
+    def _remove(self, key) -> int:
+        row = self.rows.pop(key)
+        del self.last_hour[key]
+        if _per_post(key):
+            self.post_series -= 1
+        return row
+
+    def reclaim(self, hour: int):
+        """Free every row whose data has aged out"""
+        self.reclaimed_at = hour
+        for key, last in list(self.last_hour.items()):
+            if last < hour - self.retention:
+                self.free.append(self._remove(key))
+
+    def assign(self, key, hour: int) -> Tuple[Optional[int], bool]:
+        """(row, new) for a series written at `hour`; row is None when there is no room"""
+        row = self.rows.get(key)
+        if row is not None:
+            self.last_hour[key] = hour
+            return row, False
+        per_post = _per_post(key)
+        if not self.free and self.reclaimed_at != hour:
+            self.reclaim(hour)
+        if per_post and (self.post_series >= self.post_limit or not self.free):
+            oldest = min((k for k in self.last_hour if _per_post(k)), key=self.last_hour.get, default=None)
+            if oldest is None:
+                rollup_series_dropped.inc()
+                return None, False
+            self.free.append(self._remove(oldest))
+            rollup_series_evicted.inc()
+        elif not self.free:
+            rollup_series_dropped.inc()
+            return None, False
+        row = self.rows[key] = self.free.pop()
+        self.last_hour[key] = hour
+        if per_post:
+            self.post_series += 1
+        return row, True
+
+def _per_post(key) -> bool:
+    return any(name == "post_id" for name, _ in key[1])
+
+class RollupStore:
+    def __init__(
+        self,
+        directory: str,
+        max_series: int = 4096,
+        minute_slots: int = 24 * 60,
+        hour_slots: int = 90 * 24,
+        max_sketch_series: int = 256,
+        sketch_slots: int = 7 * 24,
+        max_post_series: Optional[int] = None,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "series.json")
+        layout = [max_series, minute_slots, hour_slots, max_sketch_series, sketch_slots, SKETCH_BINS]
+        meta = self._load_meta()
+        if meta.get("layout") != layout:
+            if meta:
+                logger.warning("Rollup layout changed, starting from empty rollups")
+            for name in os.listdir(directory):
+                if name.split(".")[0] in ("minutes", "hours", "sketches"):
+                    os.remove(os.path.join(directory, name))
+            meta = {}
+        self.layout = layout
+        now = int(time.time() // HOUR)
+        # Per-post series get at most 3/4 of the rows by default, the rest stays for low-cardinality ones
+        post_limit = max_post_series if max_post_series is not None else max_series * 3 // 4
+        retention = max(hour_slots, -(-minute_slots * MINUTE // HOUR))
+        self.series = SeriesIndex(max_series, post_limit, retention, meta.get("series", []), now)
+        self.sketch_series = SeriesIndex(max_sketch_series, max_sketch_series, sketch_slots, meta.get("sketch_series", []), now)
+        self.compacted_until = meta.get("compacted_until", -1)  # last hour folded into `hours`
+        self.max_series = max_series
+        self.max_sketch_series = max_sketch_series
+
+        self.minutes = Ring(os.path.join(directory, "minutes"), MINUTE, minute_slots, max_series, np.uint32)
+        self.hours = Ring(os.path.join(directory, "hours"), HOUR, hour_slots, max_series, np.uint32)
+        self.sketches = Ring(os.path.join(directory, "sketches"), HOUR, sketch_slots, max_sketch_series, np.uint32, (SKETCH_BINS,))
+
+    def _load_meta(self) -> dict:
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def _key(metric: str, labels: dict) -> Tuple[str, Tuple]:
+        return metric, tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def record(self, metric: str, labels: dict, count: int, ts: float):
+        row, new = self.series.assign(self._key(metric, labels), int(ts // HOUR))
+        if row is None:
+            return
+        if new:
+            # Whatever is left in the row belongs to an earlier series (or one lost in a crash)
+            self.minutes.values[:, row] = 0
+            self.hours.values[:, row] = 0
+        self.minutes.values[self.minutes.column(self.minutes.bucket(ts)), row] += count
+
+    def record_latency(self, metric: str, labels: dict, values_ms: List[float], ts: float):
+        row, new = self.sketch_series.assign(self._key(metric, labels), int(ts // HOUR))
+        if row is None:
+            return
+        if new:
+            self.sketches.values[:, row] = 0
+        cells = self.sketches.values[self.sketches.column(self.sketches.bucket(ts)), row]
+        np.add.at(cells, sketch_bins(values_ms), 1)
+
+    def compact(self, now: float):
+        """Fold every finished hour still in the minute ring into the hour ring"""
+        current = int(now // HOUR)
+        first = max(self.compacted_until + 1, current - self.minutes.slots * MINUTE // HOUR)
+        for hour in range(first, current):
+            minutes = self.minutes.read(range(self.max_series), hour * 60, hour * 60 + 59)
+            self.hours.values[self.hours.column(hour)] = minutes.sum(axis=0)
+            self.compacted_until = hour
+        self.series.reclaim(current)
+        self.sketch_series.reclaim(current)
+
+    def flush(self):
+        for ring in (self.minutes, self.hours, self.sketches):
+            ring.flush()
+        meta = {
+            "layout": self.layout,
+            "compacted_until": self.compacted_until,
+            "series": self.series.entries(),
+            "sketch_series": self.sketch_series.entries(),
+        }
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def _groups(self, index: dict, metric: str, filters: dict, group_by: List[str]) -> Dict[Tuple, List[int]]:
+        groups = {}
+        for (name, labels), row in index.items():
+            if name != metric:
+                continue
+            labels = dict(labels)
+            if any(labels.get(key) != value for key, value in filters.items()):
+                continue
+            groups.setdefault(tuple(labels.get(key) for key in group_by), []).append(row)
+        return groups
+
+    def query(
+        self,
+        metric: str,
+        start: float,
+        end: float,
+        resolution: str,
+        filters: Optional[dict] = None,
+        group_by: Optional[List[str]] = None,
+        quantiles: Optional[List[float]] = None,
+    ) -> dict:
+        filters, group_by = filters or {}, group_by or []
+        width = MINUTE if resolution == "minute" else HOUR
+        first, last = int(start // width), int(end // width)
+        result = {
+            "metric": metric,
+            "resolution": resolution,
+            "buckets": [datetime.fromtimestamp(b * width, timezone.utc).isoformat() for b in range(first, last + 1)],
+            "series": [],
+        }
+
+        if quantiles:
+            for key, rows in self._groups(self.sketch_series, metric, filters, group_by).items():
+                merged = self.sketches.read(rows, first, last).sum(axis=1)
+                result["series"].append({
+                    "labels": dict(zip(group_by, key)),
+                    "values": {str(q): [sketch_quantile(cell, q) for cell in merged] for q in quantiles},
+                    "counts": merged.sum(axis=1).tolist(),
+                })
+            return result
+
+        for key, rows in self._groups(self.series, metric, filters, group_by).items():
+            if resolution == "minute":
+                values = self.minutes.read(rows, first, last).sum(axis=1)
+            else:
+                values = self.hours.read(rows, first, last).sum(axis=1)
+                # Hours not compacted yet come straight from the minute ring
+                pending = max(first, self.compacted_until + 1)
+                if pending <= last:
+                    minutes = self.minutes.read(rows, pending * 60, last * 60 + 59).sum(axis=1)
+                    values[pending - first:] = minutes.reshape(-1, 60).sum(axis=1)
+            result["series"].append({"labels": dict(zip(group_by, key)), "values": values.tolist()})
+        return result
+
+    def ingest(self, events, ts: float):
+        """Roll a validated /events/batch payload into series"""
+        counts: Dict[Tuple[str, Tuple], int] = {}
+        latencies: Dict[Tuple[str, Tuple], List[float]] = {}
+        for event in events:
+            event_type = event.event_type
+            if event_type in ("login", "logout"):
+                key = (event_type + "s", ())
+            elif event_type == "post_created":
+                key = ("posts_created", (("content_type", event.content_type),))
+            elif event_type == "like":
+                key = ("likes", (("content_type", event.content_type),))
+            elif event_type == "comment":
+                key = ("comments", (("post_id", event.post_id),))
+            elif event_type == "post_view":
+                key = ("post_views", (("post_id", event.post_id),))
+            elif event_type == "request":
+                latencies.setdefault(("request_latency_ms", (("service", event.service), ("route", event.route))), []).append(event.duration_ms)
+                continue
+            elif event_type == "error":
+                key = ("errors", (("service", event.service), ("error_type", event.error_type)))
+            else:
+                continue
+            counts[key] = counts.get(key, 0) + 1
+
+        for (metric, labels), count in counts.items():
+            self.record(metric, {name: value for name, value in labels if value is not None}, count, ts)
+        for (metric, labels), values in latencies.items():
+            self.record_latency(metric, dict(labels), values, ts)
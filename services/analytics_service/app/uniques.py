@@ -0,0 +1,158 @@
+"""Unique user counts with HyperLogLog sketches.
+
+A sketch is 2**p one-byte registers whatever the number of users, and two sketches merge by
+taking the register-wise max, so daily sketches combine into rolling weeks/months and sketches
+exported by different replicas combine into one count.
+"""
+from collections import OrderedDict
+from typing import Iterable
+import json
+import logging
+import os
+
+import numpy as np
+
+from metrics import unique_viewers_evicted
+from rollups import Ring
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+ACTIVE_USERS_PRECISION = 14  # 16 KiB per day, ~0.8% standard error
+POST_VIEWERS_PRECISION = 10  # 1 KiB per post, ~3.3% standard error
+
+def _hash64(values: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer: ids are sequential, registers need well-spread bits
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    with np.errstate(over="ignore"):
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def add(registers: np.ndarray, ids: Iterable[int]):
+    """Fold user ids into a sketch in place"""
+    ids = np.fromiter(ids, dtype=np.int64)
+    if not len(ids):
+        return
+    p = int(np.log2(len(registers)))
+    hashes = _hash64(ids)
+    index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - p)) - 1)
+    # Position of the first 1 bit in the remaining 64 - p bits
+    rank = np.full(len(ids), 64 - p + 1, dtype=np.int64)
+    nonzero = rest > 0
+    rank[nonzero] = (64 - p) - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64)
+    np.maximum.at(registers, index, rank.astype(registers.dtype))
+
+def estimate(registers: np.ndarray) -> int:
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        # Linear counting is more accurate while most registers are still empty
+        return round(m * np.log(m / zeros))
+    return round(raw)
+
+class UniqueCounter:
+    """Daily active-user sketches (rolling DAU/WAU/MAU) and unique viewers of the `max_posts` most recently viewed posts"""
+
+    def __init__(self, directory: str, max_posts: int = 10000, days: int = 32):
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "post_viewers.json")
+        self.layout = [days, ACTIVE_USERS_PRECISION, POST_VIEWERS_PRECISION]
+        meta = self._load_meta()
+        if meta.get("layout") != self.layout:
+            # Registers of another precision or day count can't be reinterpreted
+            if meta:
+                logger.warning("Unique counter layout changed, starting from empty sketches")
+            for name in os.listdir(directory):
+                if name.split(".")[0] in ("active_users", "post_viewers"):
+                    os.remove(os.path.join(directory, name))
+            meta = {}
+        self.days = Ring(os.path.join(directory, "active_users"), DAY, days, 1, np.uint8, (1 << ACTIVE_USERS_PRECISION,))
+
+        # Least recently viewed first; saved in this order so it survives restarts
+        self.post_rows = OrderedDict((int(post_id), row) for post_id, row in meta.get("post_rows", {}).items())
+        path = os.path.join(directory, "post_viewers.dat")
+        row_bytes = 1 << POST_VIEWERS_PRECISION
+        kept = None
+        if os.path.exists(path) and os.path.getsize(path) != max_posts * row_bytes:
+            stored = os.path.getsize(path) // row_bytes
+            old = np.memmap(path, dtype=np.uint8, mode="r", shape=(stored, row_bytes))
+            # Keep the most recently viewed posts, moved down to rows 0..n-1
+            kept = [(post_id, row) for post_id, row in self.post_rows.items() if row < stored][-max_posts:]
+            registers = np.array(old[[row for _, row in kept]])
+            del old
+            logger.warning(f"Resizing post viewer sketches from {stored} to {max_posts} posts"
+                           + (f", dropping {len(self.post_rows) - len(kept)}" if len(kept) < len(self.post_rows) else ""))
+            self.post_rows = OrderedDict((post_id, row) for row, (post_id, _) in enumerate(kept))
+            os.truncate(path, max_posts * row_bytes)
+        self.posts = np.memmap(path, dtype=np.uint8, mode="r+" if os.path.exists(path) else "w+",
+                               shape=(max_posts, row_bytes))
+        if kept:
+            self.posts[:len(kept)] = registers
+        self.max_posts = max_posts
+
+    def _load_meta(self) -> dict:
+        try:
+            with open(self.index_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if "layout" not in meta:
+            # Written before the layout was stored: a bare post_id -> row map, 32 days of sketches
+            meta = {"layout": [32, 14, 10], "post_rows": meta}
+        return meta
+
+    def record_active(self, user_ids: Iterable[int], ts: float):
+        add(self.days.values[self.days.column(self.days.bucket(ts)), 0], user_ids)
+
+    def record_views(self, post_id: int, user_ids: Iterable[int]):
+        row = self.post_rows.get(post_id)
+        if row is not None:
+            self.post_rows.move_to_end(post_id)
+        else:
+            if len(self.post_rows) >= self.max_posts:
+                # Full: the least recently viewed post gives up its row (and its count)
+                _, row = self.post_rows.popitem(last=False)
+                unique_viewers_evicted.inc()
+            else:
+                row = len(self.post_rows)
+            # Also clears registers of a post lost in a crash before the index was saved
+            self.posts[row] = 0
+            self.post_rows[post_id] = row
+        add(self.posts[row], user_ids)
+
+    def active_sketch(self, days: int, now: float) -> np.ndarray:
+        """Merged sketch of the last `days` days, today included"""
+        today = self.days.bucket(now)
+        return self.days.read([0], today - days + 1, today)[:, 0].max(axis=0)
+
+    def active_users(self, days: int, now: float) -> int:
+        return estimate(self.active_sketch(days, now))
+
+    def post_viewers(self, post_id: int) -> int:
+        row = self.post_rows.get(post_id)
+        return estimate(self.posts[row]) if row is not None else 0
+
+    def ingest(self, events, ts: float):
+        active, views = [], {}
+        for event in events:
+            user_id = getattr(event, "user_id", None)
+            if user_id is None:
+                continue
+            active.append(user_id)
+            if event.event_type == "post_view":
+                views.setdefault(event.post_id, []).append(user_id)
+        self.record_active(active, ts)
+        for post_id, user_ids in views.items():
+            self.record_views(post_id, user_ids)
+
+    def flush(self):
+        self.days.flush()
+        self.posts.flush()
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"layout": self.layout, "post_rows": self.post_rows}, f)
+        os.replace(tmp, self.index_path)
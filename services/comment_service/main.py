@@ -1,17 +1,32 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from typing import List, Optional
-import models, schemas
-from shared.database import engine, get_db
-from shared.auth import get_current_user
-from shared.middleware import error_handler
+from datetime import datetime
+import models, schemas, rating_stats
+from shared.database import get_db
+from shared.auth import get_current_user, require_export_key, require_import_key
+from shared.middleware import add_shared_middleware
+from shared.batch import BatchRequest, BatchResponse, BulkRequest, BulkResponse, fetch_batch, insert_many
+from shared.cache import etag_for, response_cache
+from shared.events import emitter
+from shared.export import changed_since, export_format, export_response
+from shared.lifespan import readiness, service_lifespan
+from shared.metrics import metrics_endpoint
+from shared.pagination import NEXT_CURSOR_HEADER, Keyset, set_next_cursor
+from shared.projection import ORJSONResponse, Projection
 import re
 
-models.Base.metadata.create_all(bind=engine)
+app = FastAPI(title="Comment Service", lifespan=service_lifespan())
+add_shared_middleware(app, rate_limit=100)
+app.get("/metrics")(metrics_endpoint)
+app.get("/ready")(readiness)
 
-app = FastAPI(title="Comment Service")
-app.middleware("http")(error_handler)
+# Top-level comments best rated first, replies oldest first
+TOP_RATED = Keyset(models.Comment.rating, models.Comment.created_at, models.Comment.id, descending=True)
+OLDEST_FIRST = Keyset(models.Comment.created_at, models.Comment.id)
+
+COMMENT_COLUMNS = Projection(models.Comment, schemas.CommentResponse)
 
 def extract_mentions(content: str) -> List[str]:
     """Extract @ mentions from comment content"""
@@ -20,12 +35,13 @@ def extract_mentions(content: str) -> List[str]:
 @app.post("/comments/", response_model=schemas.CommentResponse)
 async def create_comment(
     comment: schemas.CommentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user_id: int = Depends(get_current_user)
 ):
     # Validate parent comment if it exists
     if comment.parent_id:
-        parent_comment = db.query(models.Comment).filter(models.Comment.id == comment.parent_id).first()
+        result = await db.execute(select(models.Comment).filter(models.Comment.id == comment.parent_id))
+        parent_comment = result.scalars().first()
         if not parent_comment:
             raise HTTPException(status_code=404, detail="Parent comment not found")
         if parent_comment.parent_id:
@@ -48,75 +64,186 @@ async def create_comment(
         user_id=current_user_id
     )
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    await rating_stats.comment_added(db, db_comment)
+    await db.commit()
+    await response_cache.bump(f"comments:post:{db_comment.post_id}")
+    emitter.emit("comment", post_id=db_comment.post_id)
+    await db.refresh(db_comment)
     return db_comment
 
+@app.post("/comments/bulk", response_model=BulkResponse, dependencies=[Depends(require_import_key)])
+async def create_comments_bulk(bulk: BulkRequest[schemas.CommentImport], db: AsyncSession = Depends(get_db)):
+    # Imports: one query checks every parent, then a few multi-row inserts and one commit
+    parent_ids = {comment.parent_id for comment in bulk.items if comment.parent_id is not None}
+    parents = {}
+    if parent_ids:
+        rows = await db.execute(
+            select(models.Comment.id, models.Comment.parent_id, models.Comment.post_id).filter(models.Comment.id.in_(parent_ids))
+        )
+        parents = {row.id: row for row in rows}
+    errors = []
+    for index, comment in enumerate(bulk.items):
+        if comment.parent_id is None:
+            continue
+        parent = parents.get(comment.parent_id)
+        if parent is None:
+            message = "Parent comment not found"
+        elif parent.parent_id is not None:
+            message = "Cannot nest comments more than one level deep"
+        elif parent.post_id != comment.post_id:
+            message = "Parent comment is on a different post"
+        else:
+            continue
+        errors.append({"loc": ["body", "items", index, "parent_id"], "msg": message, "type": "value_error"})
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    rows = [comment.model_dump(exclude={"created_at"} if comment.created_at is None else None) for comment in bulk.items]
+    ids = await insert_many(db, models.Comment, rows)
+    await rating_stats.comments_added(db, rows)
+    await db.commit()
+    for post_id in {comment.post_id for comment in bulk.items}:
+        await response_cache.bump(f"comments:post:{post_id}")
+    for comment in bulk.items:
+        emitter.emit("comment", post_id=comment.post_id)
+    return {"ids": ids}
+
+@app.post("/comments/batch", response_model=BatchResponse[schemas.CommentResponse])
+async def get_comments_batch(batch: BatchRequest, db: AsyncSession = Depends(get_db)):
+    return await fetch_batch(db, models.Comment, batch.ids)
+
+@app.get("/comments/export", dependencies=[Depends(require_export_key)])
+async def export_comments(request: Request, format: Optional[str] = None, updated_since: Optional[datetime] = None):
+    query = COMMENT_COLUMNS.select().order_by(models.Comment.id)
+    if updated_since is not None:
+        query = query.filter(changed_since(models.Comment, updated_since))
+    return export_response(request, COMMENT_COLUMNS, query, export_format(request, format))
+
 @app.get("/comments/post/{post_id}", response_model=List[schemas.CommentResponse])
 async def get_post_comments(
     post_id: int,
+    request: Request,
     parent_id: Optional[int] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(models.Comment).filter(models.Comment.post_id == post_id)
+    # Every page of a post's comments is retired at once when any of its comments change
+    key = f"{await response_cache.scope(f'comments:post:{post_id}')}:{parent_id}:{cursor}:{skip}:{limit}"
+    cached = await response_cache.lookup(request, key)
+    if cached:
+        return cached
+
+    query = COMMENT_COLUMNS.select().filter(models.Comment.post_id == post_id)
     
     # Filter by parent_id (None for top-level comments, specific ID for replies)
     query = query.filter(models.Comment.parent_id == parent_id)
     
     # Order by creation date, with top-level comments ordered by rating as well
-    if parent_id is None:
-        query = query.order_by(models.Comment.rating.desc(), models.Comment.created_at.desc())
-    else:
-        query = query.order_by(models.Comment.created_at.asc())
+    keyset = TOP_RATED if parent_id is None else OLDEST_FIRST
+    query = keyset.apply(query, cursor)
+    if cursor is None:
+        query = query.offset(skip)
     
-    return query.offset(skip).limit(limit).all()
+    comments = (await db.execute(query.limit(limit))).all()
+    next_cursor = keyset.next_cursor(comments, limit)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return await response_cache.store_body(
+        request, key, etag_for(*comments, extra=(next_cursor,)), lambda: COMMENT_COLUMNS.body(comments), headers
+    )
+
+@app.get("/comments/post/{post_id}/thread", response_model=List[schemas.CommentThread])
+async def get_post_thread(
+    post_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    replies: int = Query(3, ge=1, le=50, description="Replies to include per top-level comment"),
+    db: AsyncSession = Depends(get_db)
+):
+    # A page of top-level comments, same order and cursor as GET /comments/post/{post_id}
+    query = TOP_RATED.apply(
+        COMMENT_COLUMNS.select().filter(models.Comment.post_id == post_id, models.Comment.parent_id.is_(None)),
+        cursor
+    )
+    comments = (await db.execute(query.limit(limit))).all()
+    set_next_cursor(response, TOP_RATED.next_cursor(comments, limit))
+    if not comments:
+        return ORJSONResponse([], headers=response.headers)
+
+    # First few replies of every comment on the page plus their totals, in one windowed query
+    ranked = (
+        COMMENT_COLUMNS.select(
+            func.row_number().over(partition_by=models.Comment.parent_id, order_by=OLDEST_FIRST.order_by()).label("position"),
+            func.count().over(partition_by=models.Comment.parent_id).label("reply_count"),
+        )
+        .filter(models.Comment.parent_id.in_([comment.id for comment in comments]))
+        .subquery()
+    )
+    rows = await db.execute(
+        select(*[ranked.c[key] for key in COMMENT_COLUMNS.keys], ranked.c.reply_count)
+        .filter(ranked.c.position <= replies)
+        .order_by(ranked.c.parent_id, ranked.c.position)
+    )
+    threads = {comment.id: {"comment": comment, "reply_count": 0, "replies": []} for comment in comments}
+    for row in rows:
+        thread = threads[row.parent_id]
+        thread["replies"].append(row)
+        thread["reply_count"] = row.reply_count
+
+    # More replies continue from GET /comments/{id}/replies?cursor=...
+    for thread in threads.values():
+        if thread["reply_count"] > len(thread["replies"]):
+            thread["replies_cursor"] = OLDEST_FIRST.next_cursor(thread["replies"], replies)
+        thread["comment"] = COMMENT_COLUMNS.dict(thread["comment"])
+        thread["replies"] = COMMENT_COLUMNS.dicts(thread["replies"])
+    return ORJSONResponse(list(threads.values()), headers=response.headers)
 
 @app.get("/comments/{comment_id}/replies", response_model=List[schemas.CommentResponse])
 async def get_comment_replies(
     comment_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify comment exists
-    comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+    result = await db.execute(select(models.Comment).filter(models.Comment.id == comment_id))
+    comment = result.scalars().first()
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
     # Get replies
-    replies = db.query(models.Comment)\
-        .filter(models.Comment.parent_id == comment_id)\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
-    return replies
+    query = OLDEST_FIRST.apply(COMMENT_COLUMNS.select().filter(models.Comment.parent_id == comment_id), cursor)
+    if cursor is None:
+        query = query.offset(skip)
+    replies = (await db.execute(query.limit(limit))).all()
+    set_next_cursor(response, OLDEST_FIRST.next_cursor(replies, limit))
+    return COMMENT_COLUMNS.response(replies, headers=response.headers)
 
-@app.get("/comments/average-rating/{post_id}")
-async def get_post_average_rating(post_id: int, db: Session = Depends(get_db)):
-    result = db.query(func.avg(models.Comment.rating))\
-        .filter(models.Comment.post_id == post_id)\
-        .scalar()
-    
-    return {
-        "post_id": post_id,
-        "average_rating": float(result) if result else None,
-        "total_ratings": db.query(models.Comment)\
-            .filter(models.Comment.post_id == post_id)\
-            .count()
-    }
+@app.get("/comments/average-rating/{post_id}", response_model=schemas.RatingStats)
+async def get_post_average_rating(post_id: int, db: AsyncSession = Depends(get_db)):
+    # Served from post_rating_stats, which counts top-level ratings only (replies are separate)
+    stats = await db.get(models.PostRatingStats, post_id)
+    return rating_stats.to_response(post_id, stats)
+
+@app.post("/comments/average-rating/batch", response_model=schemas.RatingStatsBatch)
+async def get_posts_average_rating(batch: BatchRequest, db: AsyncSession = Depends(get_db)):
+    # Stats for many posts in request order; posts without comments get zeroes
+    return {"results": await rating_stats.get_many(db, batch.ids)}
 
 @app.put("/comments/{comment_id}", response_model=schemas.CommentResponse)
 async def update_comment(
     comment_id: int,
     comment_update: schemas.CommentUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user_id: int = Depends(get_current_user)
 ):
     # Get existing comment
-    db_comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+    result = await db.execute(select(models.Comment).filter(models.Comment.id == comment_id))
+    db_comment = result.scalars().first()
     if not db_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -129,28 +256,35 @@ async def update_comment(
         raise HTTPException(status_code=400, detail="Cannot set rating on reply comments")
     
     # Update fields
+    old_rating = db_comment.rating
     for field, value in comment_update.dict(exclude_unset=True).items():
         setattr(db_comment, field, value)
     
-    db.commit()
-    db.refresh(db_comment)
+    if db_comment.parent_id is None and db_comment.rating is not None:
+        await rating_stats.rating_changed(db, db_comment.post_id, old_rating, db_comment.rating)
+    await db.commit()
+    await response_cache.bump(f"comments:post:{db_comment.post_id}")
+    await db.refresh(db_comment)
     return db_comment
 
 @app.delete("/comments/{comment_id}")
 async def delete_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user_id: int = Depends(get_current_user)
 ):
-    db_comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+    result = await db.execute(select(models.Comment).filter(models.Comment.id == comment_id))
+    db_comment = result.scalars().first()
     if not db_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
     if db_comment.user_id != current_user_id:
         raise HTTPException(status_code=403, detail="Cannot delete other users' comments")
     
-    db.delete(db_comment)
-    db.commit()
+    await db.delete(db_comment)
+    await rating_stats.comment_removed(db, db_comment)
+    await db.commit()
+    await response_cache.bump(f"comments:post:{db_comment.post_id}")
     return {"message": "Comment deleted successfully"}
 
 @app.get("/health")
@@ -0,0 +1,12 @@
+"""Schema changes to existing comment tables, applied in order by shared.migrate"""
+import models
+import rating_stats
+from shared.schema import create_indexes
+
+def keyset_indexes(conn):
+    create_indexes(conn, models.Comment.__table__, ["ix_comments_post_parent_rating_created_id", "ix_comments_parent_created_id"])
+
+MIGRATIONS = [
+    (1, "keyset pagination indexes", keyset_indexes),
+    (2, "post_rating_stats from existing comments", rating_stats.rebuild),
+]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, CheckConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, CheckConstraint, Index
 from sqlalchemy.sql import func
 from shared.database import Base
 
@@ -20,4 +20,21 @@ class Comment(Base):
         CheckConstraint('(rating IS NULL AND parent_id IS NOT NULL) OR (rating BETWEEN 1 AND 5 AND parent_id IS NULL)', 
                        name='valid_rating_and_nesting'),
         CheckConstraint('id != parent_id', name='prevent_self_reference'),
-    ) 
\ No newline at end of file
+        # Keyset pagination orders (see main.py)
+        Index('ix_comments_post_parent_rating_created_id', 'post_id', 'parent_id', 'rating', 'created_at', 'id'),
+        Index('ix_comments_parent_created_id', 'parent_id', 'created_at', 'id'),
+    )
+
+class PostRatingStats(Base):
+    """Running rating totals per post, kept in step with comments by rating_stats.py"""
+    __tablename__ = "post_rating_stats"
+
+    post_id = Column(Integer, primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)  # top-level comments only
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+    stars_4 = Column(Integer, nullable=False, default=0)
+    stars_5 = Column(Integer, nullable=False, default=0)
+    reply_count = Column(Integer, nullable=False, default=0)
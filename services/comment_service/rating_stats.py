@@ -0,0 +1,92 @@
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+import models
+
+STARS = range(1, 6)
+
+def _changes(rating: Optional[int], parent_id: Optional[int], sign: int) -> Dict[str, int]:
+    if parent_id is not None:
+        return {"reply_count": sign}
+    return {"rating_sum": sign * rating, "rating_count": sign, f"stars_{rating}": sign}
+
+async def _apply(db: AsyncSession, post_id: int, changes: Dict[str, int]):
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    table = models.PostRatingStats.__table__
+    stmt = dialect.insert(table).values(post_id=post_id, **changes)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.post_id],
+        set_={column: table.c[column] + value for column, value in changes.items()}
+    )
+    await db.execute(stmt)
+
+# All of these run in the caller's transaction, so stats commit (or roll back) with the comment
+
+async def comment_added(db: AsyncSession, comment: models.Comment):
+    await _apply(db, comment.post_id, _changes(comment.rating, comment.parent_id, 1))
+
+async def comments_added(db: AsyncSession, comments: List[dict]):
+    """comment_added() for a bulk insert, one upsert per post"""
+    by_post: Dict[int, Dict[str, int]] = {}
+    for comment in comments:
+        totals = by_post.setdefault(comment["post_id"], {})
+        for column, value in _changes(comment.get("rating"), comment.get("parent_id"), 1).items():
+            totals[column] = totals.get(column, 0) + value
+    for post_id, changes in by_post.items():
+        await _apply(db, post_id, changes)
+
+async def comment_removed(db: AsyncSession, comment: models.Comment):
+    await _apply(db, comment.post_id, _changes(comment.rating, comment.parent_id, -1))
+
+async def rating_changed(db: AsyncSession, post_id: int, old: int, new: int):
+    if old == new:
+        return
+    changes = {"rating_sum": new - old, f"stars_{old}": -1}
+    changes[f"stars_{new}"] = 1
+    await _apply(db, post_id, changes)
+
+def to_response(post_id: int, stats: Optional[models.PostRatingStats]) -> dict:
+    if stats is None:
+        return {"post_id": post_id, "average_rating": None, "total_ratings": 0,
+                "histogram": {str(star): 0 for star in STARS}, "reply_count": 0}
+    return {
+        "post_id": post_id,
+        "average_rating": stats.rating_sum / stats.rating_count if stats.rating_count else None,
+        "total_ratings": stats.rating_count,
+        "histogram": {str(star): getattr(stats, f"stars_{star}") for star in STARS},
+        "reply_count": stats.reply_count,
+    }
+
+async def get_many(db: AsyncSession, post_ids: List[int]) -> List[dict]:
+    rows = await db.execute(select(models.PostRatingStats).where(models.PostRatingStats.post_id.in_(set(post_ids))))
+    by_post = {stats.post_id: stats for stats in rows.scalars()}
+    return [to_response(post_id, by_post.get(post_id)) for post_id in post_ids]
+
+def rebuild(conn):
+    """Recompute post_rating_stats from the comments table, on the caller's connection"""
+    Comment = models.Comment
+    totals = (
+        select(
+            Comment.post_id,
+            func.coalesce(func.sum(Comment.rating), 0),
+            func.count(Comment.rating),
+            *[func.count(case((Comment.rating == star, 1))) for star in STARS],
+            func.count(Comment.parent_id),
+        )
+        .group_by(Comment.post_id)
+    )
+    columns = ["post_id", "rating_sum", "rating_count", *[f"stars_{star}" for star in STARS], "reply_count"]
+    conn.execute(delete(models.PostRatingStats))
+    # A single INSERT ... SELECT, so the rebuild never pulls rows into Python
+    conn.execute(insert(models.PostRatingStats).from_select(columns, totals))
+
+def repair():
+    """rebuild() in its own transaction (backfill, or fix drift)"""
+    from shared.database import get_engine
+
+    with get_engine().begin() as conn:
+        rebuild(conn)
+
+if __name__ == "__main__":
+    repair()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator, constr, computed_field
 from pydantic.types import StringConstraints
-from typing import Optional, List, Annotated
+from typing import Optional, List, Annotated, Dict
 from datetime import datetime
 import re
 
@@ -41,6 +41,24 @@ class CommentCreate(BaseModel):
             raise ValueError("Rating must be between 1 and 5")
         return v
 
+class CommentImport(BaseModel):
+    # POST /comments/bulk: migrations and imports, on behalf of any user
+    content: Annotated[str, StringConstraints(min_length=1, max_length=1000)]
+    post_id: int
+    user_id: int
+    parent_id: Optional[int] = None  # must already exist, so import top-level comments first
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    created_at: Optional[datetime] = None  # keep the original timestamp; now when omitted
+
+    @validator('rating', always=True)
+    def validate_rating(cls, v, values):
+        if values.get('parent_id') is not None:
+            if v is not None:
+                raise ValueError("Reply comments cannot have ratings")
+        elif v is None:
+            raise ValueError("Top-level comments must have a rating")
+        return v
+
 class CommentUpdate(BaseModel):
     content: Optional[Annotated[str, StringConstraints(min_length=1, max_length=1000)]] = None
     rating: Optional[int] = Field(None, ge=1, le=5)
@@ -60,11 +78,27 @@ class CommentResponse(BaseModel):
     parent_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
-    is_reply: bool = Field(default=False, description="Indicates if this is a reply to another comment")
 
-    @computed_field
+    @computed_field(description="Indicates if this is a reply to another comment")
+    @property
     def is_reply(self) -> bool:
         return self.parent_id is not None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class CommentThread(BaseModel):
+    comment: CommentResponse
+    reply_count: int
+    replies: List[CommentResponse]  # the first few, oldest first
+    replies_cursor: Optional[str] = None  # for GET /comments/{id}/replies when there are more
+
+class RatingStats(BaseModel):
+    post_id: int
+    average_rating: Optional[float] = None
+    total_ratings: int  # top-level (rated) comments
+    histogram: Dict[str, int]  # star -> number of ratings
+    reply_count: int
+
+class RatingStatsBatch(BaseModel):
+    results: List[RatingStats]
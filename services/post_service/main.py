@@ -1,81 +1,192 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Request, Response
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import models, schemas
-from shared.database import engine, get_db
-from shared.auth import get_current_user
-from shared.middleware import error_handler
-from s3 import s3_handler
-from sqlalchemy import or_
+import models, schemas, media, search
+from shared.database import get_db
+from shared.auth import get_current_user, get_optional_user, require_export_key, require_import_key
+from shared.middleware import add_shared_middleware
+from shared.batch import BatchRequest, BatchResponse, BulkRequest, BulkResponse, fetch_batch, insert_many
+from shared.cache import etag_for, response_cache
+from shared.events import emitter
+from shared.export import changed_since, export_format, export_response
+from shared.lifespan import readiness, service_lifespan
+from shared.metrics import metrics_endpoint
+from shared.pagination import next_offset_cursor, offset_from_cursor, set_next_cursor
+from shared.projection import Projection
+from shared.s3 import s3_handler
+from sqlalchemy import select
 
-models.Base.metadata.create_all(bind=engine)
+app = FastAPI(title="Post Service", lifespan=service_lifespan(s3_handler.connect))
+add_shared_middleware(app, rate_limit=100)
+app.get("/metrics")(metrics_endpoint)
+app.get("/ready")(readiness)
 
-app = FastAPI(title="Post Service")
-app.middleware("http")(error_handler)
+POST_COLUMNS = Projection(models.Post, schemas.PostResponse)
 
 @app.post("/posts/", response_model=schemas.PostResponse)
 async def create_post(
     content: str,
     job_title: str,
     resume_file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user_id: int = Depends(get_current_user)
 ):
-    # Upload resume
-    resume_url = await s3_handler.upload_file(resume_file, file_type="resume")
+    # Upload before touching the database (skipped when the same file is already stored), so
+    # no connection or row lock is held during the transfer; the key is the content hash, so
+    # uploading again is harmless
+    key, content_type = await s3_handler.prepare_upload(resume_file, file_type="resume")
+    await s3_handler.store_upload(resume_file, key, content_type)
+    await media.acquire(db, key)
+    resume_url = s3_handler.object_url(key)
     
-    # Create post
+    # Create post; form fields skip PostBase, so sanitize them the same way
     db_post = models.Post(
-        content=content,
-        job_title=job_title,
+        content=schemas.CONTENT_CLEANER.clean(content),
+        job_title=schemas.TEXT_CLEANER.clean(job_title),
+        resume_url=resume_url,
+        user_id=current_user_id
+    )
+    db.add(db_post)
+    await db.commit()
+    # The last other post may have deleted the object between our upload and commit; with our
+    # reference committed nothing deletes it now, so put it back if it went
+    await s3_handler.store_upload(resume_file, key, content_type)
+    emitter.emit("post_created", content_type="resume")
+    await db.refresh(db_post)
+    return db_post
+
+@app.post("/posts/uploads", response_model=schemas.UploadTicket)
+async def create_resume_upload(
+    upload: schemas.UploadRequest,
+    current_user_id: int = Depends(get_current_user)
+):
+    # Step 1 of the direct upload flow: the client POSTs the file straight to S3
+    return s3_handler.create_presigned_upload(
+        file_type="resume",
+        owner_id=current_user_id,
+        content_type=upload.content_type,
+        size=upload.size
+    )
+
+@app.post("/posts/finalize", response_model=schemas.PostResponse)
+async def finalize_post(
+    post: schemas.PostFinalize,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user)
+):
+    # Step 2: check what landed in the bucket, then create the post. Direct uploads have their
+    # own uuid key (not content-addressed), so this is the object's only reference
+    resume_url = await s3_handler.verify_upload(post.upload_key, file_type="resume", owner_id=current_user_id)
+    await media.acquire(db, post.upload_key)
+
+    db_post = models.Post(
+        content=post.content,
+        job_title=post.job_title,
+        skills=post.skills,
+        experience_years=post.experience_years,
+        is_open_to_work=post.is_open_to_work,
         resume_url=resume_url,
         user_id=current_user_id
     )
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
+    await db.flush()
+    await search.set_post_skills(db, db_post.id, db_post.skills)
+    await db.commit()
+    emitter.emit("post_created", content_type="resume")
+    await db.refresh(db_post)
     return db_post
 
+@app.post("/posts/bulk", response_model=BulkResponse, dependencies=[Depends(require_import_key)])
+async def create_posts_bulk(bulk: BulkRequest[schemas.PostImport], db: AsyncSession = Depends(get_db)):
+    # Imports: the whole list is validated (and sanitized) up front, then inserted in a few
+    # multi-row statements and one commit instead of a commit + refresh per post
+    rows = [post.model_dump(exclude={"created_at"} if post.created_at is None else None) for post in bulk.items]
+    ids = await insert_many(db, models.Post, rows)
+    await search.insert_post_skills(db, [(id, post.skills) for id, post in zip(ids, bulk.items)])
+    await media.acquire_many(db, [s3_handler.key_from_url(post.resume_url) for post in bulk.items])
+    await db.commit()
+    for _ in ids:
+        emitter.emit("post_created", content_type="resume")
+    return {"ids": ids}
+
+@app.post("/posts/batch", response_model=BatchResponse[schemas.PostResponse])
+async def get_posts_batch(batch: BatchRequest, db: AsyncSession = Depends(get_db)):
+    return await fetch_batch(db, models.Post, batch.ids)
+
+@app.get("/posts/export", dependencies=[Depends(require_export_key)])
+async def export_posts(request: Request, format: Optional[str] = None, updated_since: Optional[datetime] = None):
+    query = POST_COLUMNS.select().order_by(models.Post.id)
+    if updated_since is not None:
+        query = query.filter(changed_since(models.Post, updated_since))
+    return export_response(request, POST_COLUMNS, query, export_format(request, format))
+
 @app.get("/posts/{post_id}", response_model=schemas.PostResponse)
-async def get_post(post_id: int, db: Session = Depends(get_db)):
-    post = db.query(models.Post).filter(models.Post.id == post_id).first()
+async def get_post(
+    post_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    viewer_id: Optional[int] = Depends(get_optional_user)
+):
+    key = await response_cache.scope(f"post:{post_id}")
+    cached = await response_cache.lookup(request, key)
+    if cached:
+        # 304s and cache hits are views too
+        emitter.emit("post_view", post_id=post_id, user_id=viewer_id)
+        return cached
+    result = await db.execute(select(models.Post).filter(models.Post.id == post_id))
+    post = result.scalars().first()
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
+    emitter.emit("post_view", post_id=post_id, user_id=viewer_id)
+    return await response_cache.store(request, key, etag_for(post), schemas.PostResponse, post)
 
 @app.get("/posts/user/{user_id}", response_model=List[schemas.PostResponse])
-async def get_user_posts(user_id: int, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    posts = db.query(models.Post)\
-        .filter(models.Post.user_id == user_id)\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    return posts
+async def get_user_posts(
+    user_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db)
+):
+    # Newest first; pass back X-Next-Cursor to continue (skip still works for old clients)
+    query = search.NEWEST_FIRST.apply(POST_COLUMNS.select().filter(models.Post.user_id == user_id), cursor)
+    if cursor is None:
+        query = query.offset(skip)
+    posts = (await db.execute(query.limit(limit))).all()
+    set_next_cursor(response, search.NEWEST_FIRST.next_cursor(posts, limit))
+    return POST_COLUMNS.response(posts, headers=response.headers)
 
 @app.put("/posts/{post_id}", response_model=schemas.PostResponse)
 async def update_post(
     post_id: int,
     post_update: schemas.PostUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    result = await db.execute(select(models.Post).filter(models.Post.id == post_id))
+    db_post = result.scalars().first()
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    for key, value in post_update.dict().items():
+    update_data = post_update.dict()
+    for key, value in update_data.items():
         setattr(db_post, key, value)
+    await search.set_post_skills(db, db_post.id, update_data["skills"])
     
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await response_cache.bump(f"post:{post_id}")
+    await db.refresh(db_post)
     return db_post
 
 @app.delete("/posts/{post_id}")
 async def delete_post(
     post_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user_id: int = Depends(get_current_user)
 ):
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    result = await db.execute(select(models.Post).filter(models.Post.id == post_id))
+    db_post = result.scalars().first()
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -86,12 +197,18 @@ async def delete_post(
             detail="Cannot delete posts of other users"
         )
     
-    # Delete associated media file if exists
-    if db_post.resume_url:
-        s3_handler.delete_file(db_post.resume_url)
+    # Only remove the media file once no other post references it
+    orphaned_key = None
+    if db_post.resume_url and await media.release(db, s3_handler.key_from_url(db_post.resume_url)):
+        orphaned_key = s3_handler.key_from_url(db_post.resume_url)
     
-    db.delete(db_post)
-    db.commit()
+    await db.delete(db_post)
+    await db.commit()
+    await response_cache.bump(f"post:{post_id}")
+    
+    if orphaned_key:
+        # The post is gone either way; a failed S3 delete is left for media.sweep()
+        await media.delete_if_unreferenced(db, orphaned_key)
     return {"message": "Post deleted successfully"}
 
 @app.get("/health")
@@ -100,26 +217,34 @@ async def health_check():
 
 @app.get("/posts/search/", response_model=List[schemas.PostResponse])
 async def search_posts(
+    response: Response,
+    q: Optional[str] = None,
     job_title: Optional[str] = None,
     skills: Optional[str] = None,
     min_experience: Optional[int] = None,
     open_to_work: Optional[bool] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(models.Post)
-    
-    if job_title:
-        query = query.filter(models.Post.job_title.ilike(f"%{job_title}%"))
-    if skills:
-        # Search for any of the provided skills
-        skill_list = [skill.strip() for skill in skills.split(',')]
-        skill_filters = [models.Post.skills.ilike(f"%{skill}%") for skill in skill_list]
-        query = query.filter(or_(*skill_filters))
-    if min_experience is not None:
-        query = query.filter(models.Post.experience_years >= min_experience)
-    if open_to_work is not None:
-        query = query.filter(models.Post.is_open_to_work == open_to_work)
-    
-    return query.order_by(models.Post.created_at.desc()).offset(skip).limit(limit).all() 
\ No newline at end of file
+    # q searches job title and content, job_title only the title; both are prefix word matches
+    query = search.build_search_query(
+        db.bind.dialect.name,
+        q=q,
+        job_title=job_title,
+        skills=skills,
+        min_experience=min_experience,
+        open_to_work=open_to_work,
+        cursor=cursor,
+        columns=POST_COLUMNS.columns
+    )
+    if cursor is None:
+        query = query.offset(skip)
+    posts = (await db.execute(query.limit(limit))).all()
+    if search.is_ranked(q):
+        offset = offset_from_cursor(cursor) if cursor else skip
+        set_next_cursor(response, next_offset_cursor(offset, posts, limit))
+    else:
+        set_next_cursor(response, search.NEWEST_FIRST.next_cursor(posts, limit))
+    return POST_COLUMNS.response(posts, headers=response.headers)
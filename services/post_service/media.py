@@ -0,0 +1,119 @@
+"""Reference counts for content-addressed S3 objects, so shared files outlive single posts.
+
+A row at ref_count 0 is an object nothing points at any more. The post that dropped the last
+reference deletes it (delete_if_unreferenced) after its own commit; if that fails, the row is
+left for sweep():
+
+    python media.py
+"""
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import Counter
+from typing import Iterable, Optional
+import logging
+import models
+from shared.s3 import s3_handler
+
+logger = logging.getLogger(__name__)
+
+def _insert(db: AsyncSession):
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(models.MediaObject)
+
+async def acquire(db: AsyncSession, key: str):
+    """Add a reference to an object; runs in the caller's transaction.
+
+    Once committed, delete_if_unreferenced() leaves the object alone. An upload made before
+    the commit may already have been deleted though, so check the object again afterwards.
+    """
+    stmt = _insert(db).values(key=key, ref_count=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.MediaObject.key],
+        set_={"ref_count": models.MediaObject.ref_count + 1}
+    )
+    await db.execute(stmt)
+
+async def acquire_many(db: AsyncSession, keys: Iterable[str]):
+    """acquire() for every key, one upsert per distinct key"""
+    counts = Counter(keys)
+    if not counts:
+        return
+    stmt = _insert(db)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.MediaObject.key],
+        set_={"ref_count": models.MediaObject.ref_count + stmt.excluded.ref_count}
+    )
+    await db.execute(stmt, [{"key": key, "ref_count": count} for key, count in counts.items()])
+
+async def release(db: AsyncSession, key: str) -> bool:
+    """Drop a reference; True when nothing references the object any more.
+
+    The row stays (at 0) until the object is actually gone, see delete_if_unreferenced().
+    """
+    remaining = await db.scalar(
+        update(models.MediaObject)
+        .where(models.MediaObject.key == key)
+        .values(ref_count=models.MediaObject.ref_count - 1)
+        .returning(models.MediaObject.ref_count)
+    )
+    if remaining is None:
+        # Uploaded before refcounting (unique uuid key), so this was the only reference
+        await db.execute(_insert(db).values(key=key, ref_count=0).on_conflict_do_nothing())
+        return True
+    return remaining <= 0
+
+def _lock_unreferenced(key: str):
+    # A no-op UPDATE rather than SELECT ... FOR UPDATE, which sqlite doesn't have; either way
+    # acquire() on this key now waits for our commit
+    return (
+        update(models.MediaObject)
+        .where(models.MediaObject.key == key, models.MediaObject.ref_count <= 0)
+        .values(ref_count=models.MediaObject.ref_count)
+        .returning(models.MediaObject.key)
+    )
+
+async def delete_if_unreferenced(db: AsyncSession, key: str):
+    """Delete an object release() reported unreferenced, unless a new post took it since.
+
+    Runs in its own transaction after the caller committed the release. S3 errors are logged,
+    not raised: the row stays at 0 and sweep() retries later.
+    """
+    if await db.scalar(_lock_unreferenced(key)) is None:
+        await db.rollback()
+        return
+    try:
+        await s3_handler.delete_file(s3_handler.object_url(key))
+    except Exception as e:
+        logger.warning(f"Leaving unreferenced object {key} for the sweeper: {e}")
+        await db.rollback()
+        return
+    await db.execute(delete(models.MediaObject).where(models.MediaObject.key == key))
+    await db.commit()
+
+def sweep(limit: Optional[int] = None) -> int:
+    """Delete every object left at ref_count 0 (failed deletes); returns how many went"""
+    from shared.database import get_engine
+
+    engine = get_engine()
+    with engine.connect() as conn:
+        query = select(models.MediaObject.key).where(models.MediaObject.ref_count <= 0)
+        keys = list(conn.scalars(query.limit(limit) if limit else query))
+    deleted = 0
+    for key in keys:
+        with engine.connect() as conn:
+            if conn.scalar(_lock_unreferenced(key)) is None:
+                continue  # referenced again since
+            try:
+                s3_handler.s3_client.delete_object(Bucket=s3_handler.bucket_name, Key=key)
+            except Exception as e:
+                logger.warning(f"Could not delete {key}, will retry next sweep: {e}")
+                continue
+            conn.execute(delete(models.MediaObject).where(models.MediaObject.key == key))
+            conn.commit()
+        deleted += 1
+    return deleted
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"deleted {sweep()} unreferenced object(s)")
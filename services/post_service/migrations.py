@@ -0,0 +1,65 @@
+"""Schema changes to existing post tables, applied in order by shared.migrate"""
+from sqlalchemy import bindparam, delete, insert, select, text, update
+import models
+import schemas
+import search
+from shared.schema import add_column, create_indexes
+
+posts = models.Post.__table__
+
+def search_schema(conn):
+    """Search filters, the full-text indexes, and post_skills/FTS rows for existing posts"""
+    add_column(conn, posts.c.experience_years)
+    add_column(conn, posts.c.is_open_to_work)
+    # The column default only applies to new rows
+    conn.execute(update(posts).where(posts.c.is_open_to_work.is_(None)).values(is_open_to_work=True))
+    if conn.dialect.name == "sqlite":
+        for statement in models.SQLITE_FTS_DDL:
+            conn.execute(text(statement))
+    create_indexes(conn, posts, ["ix_posts_title_tsv", "ix_posts_document_tsv"])
+    search.rebuild(conn)
+
+def keyset_indexes(conn):
+    create_indexes(conn, posts, ["ix_posts_user_id_created_at_id", "ix_posts_created_at_id"])
+
+def sanitize_existing(conn, batch_size: int = 1000):
+    """Re-clean posts stored before every write path sanitized (POST /posts/ took raw form fields)"""
+    stmt = update(posts).where(posts.c.id == bindparam("post_id")).values(
+        content=bindparam("new_content"), job_title=bindparam("new_job_title"), skills=bindparam("new_skills")
+    )
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            select(posts.c.id, posts.c.content, posts.c.job_title, posts.c.skills)
+            .where(posts.c.id > last_id).order_by(posts.c.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return
+        last_id = batch[-1].id
+        changed, reskilled = [], []
+        for post in batch:
+            content = schemas.CONTENT_CLEANER.clean(post.content) if post.content is not None else None
+            job_title = schemas.TEXT_CLEANER.clean(post.job_title) if post.job_title is not None else None
+            skills = post.skills
+            if skills is not None:
+                try:
+                    skills = schemas.clean_skills(skills)
+                except ValueError:
+                    skills = None  # nothing left after cleaning
+            if (content, job_title, skills) != (post.content, post.job_title, post.skills):
+                changed.append({"post_id": post.id, "new_content": content, "new_job_title": job_title, "new_skills": skills})
+                if skills != post.skills:
+                    reskilled.append((post.id, skills))
+        if changed:
+            conn.execute(stmt, changed)
+        if reskilled:
+            conn.execute(delete(models.PostSkill).where(models.PostSkill.post_id.in_([id for id, _ in reskilled])))
+            rows = [{"post_id": id, "skill": skill} for id, skills in reskilled for skill in search.normalize_skills(skills)]
+            if rows:
+                conn.execute(insert(models.PostSkill), rows)
+
+MIGRATIONS = [
+    (1, "search columns, full-text indexes and skill rows", search_schema),
+    (2, "keyset pagination indexes", keyset_indexes),
+    (3, "sanitize existing post content", sanitize_existing),
+]
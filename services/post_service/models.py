@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index, DDL, event, text
+from sqlalchemy.dialects import postgresql  # registers the to_tsvector/to_tsquery constructs
 from sqlalchemy.sql import func
 from shared.database import Base
 
@@ -10,6 +11,66 @@ class Post(Base):
     content = Column(Text)  # Description or summary of the resume
     resume_url = Column(String)  # URL to the PDF resume (now required)
     job_title = Column(String, index=True)  # Job title/role
-    skills = Column(String)  # Comma-separated list of skills
+    skills = Column(String)  # Comma-separated list of skills (post_skills is the indexed copy)
+    experience_years = Column(Integer, nullable=True)
+    is_open_to_work = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # Keyset pagination: a user's posts newest first, and the global newest-first feed
+        Index('ix_posts_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_posts_created_at_id', 'created_at', 'id'),
+    )
+
+class PostSkill(Base):
+    """One row per (post, normalized skill) so skill filters are index lookups"""
+    __tablename__ = "post_skills"
+
+    post_id = Column(Integer, ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    skill = Column(String, primary_key=True)  # lowercased, trimmed
+
+    __table_args__ = (
+        Index('ix_post_skills_skill_post_id', 'skill', 'post_id'),
+    )
+
+# Full-text search. Constants are inlined as text() so the query expressions match
+# the index expressions exactly and Postgres can use the GIN indexes.
+SEARCH_CONFIG = text("'english'::regconfig")
+
+def title_tsvector():
+    return func.to_tsvector(SEARCH_CONFIG, func.coalesce(Post.job_title, text("''")))
+
+def document_tsvector():
+    return func.to_tsvector(
+        SEARCH_CONFIG,
+        func.coalesce(Post.job_title, text("''")).op('||')(text("' '")).op('||')(func.coalesce(Post.content, text("''")))
+    )
+
+Index('ix_posts_title_tsv', title_tsvector(), postgresql_using='gin').ddl_if(dialect='postgresql')
+Index('ix_posts_document_tsv', document_tsvector(), postgresql_using='gin').ddl_if(dialect='postgresql')
+
+# SQLite (tests, benchmarks) gets an external-content FTS5 table kept in sync by triggers
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(job_title, content, content='posts', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, job_title, content) VALUES (new.id, new.job_title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, job_title, content) VALUES ('delete', old.id, old.job_title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF job_title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, job_title, content) VALUES ('delete', old.id, old.job_title, old.content);
+        INSERT INTO posts_fts(rowid, job_title, content) VALUES (new.id, new.job_title, new.content);
+    END""",
+)
+for statement in SQLITE_FTS_DDL:
+    event.listen(Post.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+class MediaObject(Base):
+    """Reference count per content-addressed S3 object, so shared files outlive single posts"""
+    __tablename__ = "media_objects"
+
+    key = Column(String, primary_key=True)  # S3 key, e.g. resume/<sha256>.pdf
+    ref_count = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
@@ -1,9 +1,29 @@
 from pydantic import BaseModel, Field, validator, constr
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from fastapi import UploadFile
 import bleach
 
+# Built once instead of per bleach.clean() call, and shared by PostBase and PostUpdate.
+# Not thread-safe, which is fine here since request bodies are validated on the event loop.
+CONTENT_CLEANER = bleach.sanitizer.Cleaner(tags=['p', 'br', 'strong', 'em', 'u', 'ul', 'ol', 'li'], attributes={}, strip=True)
+TEXT_CLEANER = bleach.sanitizer.Cleaner(tags=[], strip=True)
+
+def clean_skills(v: str) -> str:
+    # Split skills and drop empties
+    skills_list = [skill.strip() for skill in TEXT_CLEANER.clean(v).split(',')]
+    valid_skills = ','.join([skill for skill in skills_list if skill])
+    if not valid_skills:
+        raise ValueError('At least one valid skill must be provided')
+    return valid_skills
+
+def validate_experience_years(v: int) -> int:
+    if v < 0:
+        raise ValueError('Experience years cannot be negative')
+    if v > 100:
+        raise ValueError('Experience years seems unrealistic')
+    return v
+
 class PostBase(BaseModel):
     content: constr(min_length=1, max_length=5000)
     job_title: constr(min_length=1, max_length=100)
@@ -13,96 +33,61 @@ class PostBase(BaseModel):
 
     @validator('content')
     def sanitize_content(cls, v):
-        # Configure allowed HTML tags and attributes
-        allowed_tags = ['p', 'br', 'strong', 'em', 'u', 'ul', 'ol', 'li']
-        allowed_attrs = {}
-        
-        # Sanitize the content
-        clean_content = bleach.clean(
-            v,
-            tags=allowed_tags,
-            attributes=allowed_attrs,
-            strip=True
-        )
-        return clean_content
+        return CONTENT_CLEANER.clean(v) if v is not None else v
 
     @validator('job_title')
     def sanitize_job_title(cls, v):
         # Remove any HTML tags from job title
-        clean_title = bleach.clean(v, tags=[], strip=True)
-        return clean_title
+        return TEXT_CLEANER.clean(v) if v is not None else v
 
     @validator('skills')
     def sanitize_and_validate_skills(cls, v):
-        if v is not None:
-            # Remove any HTML tags
-            clean_skills = bleach.clean(v, tags=[], strip=True)
-            # Split skills and validate
-            skills_list = [skill.strip() for skill in clean_skills.split(',')]
-            # Remove empty skills and join back
-            valid_skills = ','.join([skill for skill in skills_list if skill])
-            if not valid_skills:
-                raise ValueError('At least one valid skill must be provided')
-            return valid_skills
-        return v
+        return clean_skills(v) if v is not None else v
 
     @validator('experience_years')
     def validate_experience(cls, v):
-        if v is not None:
-            if v < 0:
-                raise ValueError('Experience years cannot be negative')
-            if v > 100:
-                raise ValueError('Experience years seems unrealistic')
-        return v
+        return validate_experience_years(v) if v is not None else v
 
 class PostCreate(PostBase):
     user_id: int
     resume_file: UploadFile
 
+class PostFinalize(PostBase):
+    upload_key: str  # key returned by POST /posts/uploads
+
+class PostImport(PostBase):
+    # POST /posts/bulk: migrations and imports, on behalf of any user
+    user_id: int
+    resume_url: str  # already stored, no upload step
+    created_at: Optional[datetime] = None  # keep the original timestamp; now when omitted
+
+class UploadRequest(BaseModel):
+    content_type: str
+    size: int = Field(..., gt=0, description="File size in bytes")
+
+class UploadTicket(BaseModel):
+    url: str
+    fields: Dict[str, str]
+    key: str
+    expires_in: int
+
 class PostUpdate(PostBase):
     content: Optional[constr(min_length=1, max_length=5000)] = None
     job_title: Optional[constr(min_length=1, max_length=100)] = None
     skills: Optional[str] = None
     experience_years: Optional[int] = None
     is_open_to_work: Optional[bool] = None
+    # Sanitizers are inherited from PostBase and pass None through
 
-    @validator('content')
-    def sanitize_content(cls, v):
-        if v is not None:
-            allowed_tags = ['p', 'br', 'strong', 'em', 'u', 'ul', 'ol', 'li']
-            allowed_attrs = {}
-            return bleach.clean(v, tags=allowed_tags, attributes=allowed_attrs, strip=True)
-        return v
-
-    @validator('job_title')
-    def sanitize_job_title(cls, v):
-        if v is not None:
-            return bleach.clean(v, tags=[], strip=True)
-        return v
-
-    @validator('skills')
-    def sanitize_and_validate_skills(cls, v):
-        if v is not None:
-            clean_skills = bleach.clean(v, tags=[], strip=True)
-            skills_list = [skill.strip() for skill in clean_skills.split(',')]
-            valid_skills = ','.join([skill for skill in skills_list if skill])
-            if not valid_skills:
-                raise ValueError('At least one valid skill must be provided')
-            return valid_skills
-        return v
-
-    @validator('experience_years')
-    def validate_experience(cls, v):
-        if v is not None:
-            if v < 0:
-                raise ValueError('Experience years cannot be negative')
-            if v > 100:
-                raise ValueError('Experience years seems unrealistic')
-        return v
-
-class PostResponse(PostBase):
+class PostResponse(BaseModel):
+    # Not a PostBase: rows were sanitized on create/update, so reading them back skips bleach
     id: int
     user_id: int
+    content: str
+    job_title: str
+    skills: Optional[str] = None
+    experience_years: Optional[int] = None
+    is_open_to_work: Optional[bool] = None
     resume_url: str
     created_at: datetime
     updated_at: Optional[datetime] = None
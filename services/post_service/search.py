@@ -0,0 +1,133 @@
+from sqlalchemy import column, delete, exists, func, insert, select, table, text
+from typing import List, Optional, Tuple
+import re
+import models
+from shared.pagination import Keyset, offset_from_cursor
+
+# sqlite FTS5 table created alongside posts (see models.py); `rank` is bm25, lower is better
+posts_fts = table("posts_fts", column("rowid"), column("rank"))
+
+NEWEST_FIRST = Keyset(models.Post.created_at, models.Post.id, descending=True)
+
+def normalize_skills(skills: Optional[str]) -> List[str]:
+    if not skills:
+        return []
+    seen = []
+    for skill in skills.split(','):
+        skill = skill.strip().lower()
+        if skill and skill not in seen:
+            seen.append(skill)
+    return seen
+
+async def set_post_skills(db, post_id: int, skills: Optional[str]):
+    """Replace the indexed skill rows of a post; runs in the caller's transaction"""
+    await db.execute(delete(models.PostSkill).where(models.PostSkill.post_id == post_id))
+    rows = [{"post_id": post_id, "skill": skill} for skill in normalize_skills(skills)]
+    if rows:
+        await db.execute(insert(models.PostSkill), rows)
+
+async def insert_post_skills(db, posts: List[Tuple[int, Optional[str]]]):
+    """Skill rows for newly inserted (post_id, skills), nothing to replace, in one executemany"""
+    rows = [{"post_id": post_id, "skill": skill} for post_id, skills in posts for skill in normalize_skills(skills)]
+    if rows:
+        await db.execute(insert(models.PostSkill), rows)
+
+def search_terms(value: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", value.lower()) if value else []
+
+def _postgres_query(terms: List[str]) -> str:
+    # Prefix match every word: "dev ops" -> dev:* & ops:*
+    return " & ".join(f"{term}:*" for term in terms)
+
+def _sqlite_query(terms: List[str]) -> str:
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+def build_search_query(
+    dialect: str,
+    q: Optional[str] = None,
+    job_title: Optional[str] = None,
+    skills: Optional[str] = None,
+    min_experience: Optional[int] = None,
+    open_to_work: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    columns=None,
+):
+    """Select posts (or just `columns` of them) matching the filters, most relevant first when there is a text query.
+
+    Unranked results seek past `cursor` on (created_at, id); relevance isn't stored, so ranked
+    cursors carry an offset instead (see is_ranked).
+    """
+    query = select(*columns) if columns else select(models.Post)
+    q_terms, title_terms = search_terms(q), search_terms(job_title)
+    rank = None
+
+    # q is ranked by relevance; job_title is only a filter, so results keep newest-first order
+    if dialect == "postgresql":
+        if title_terms:
+            query = query.filter(models.title_tsvector().op('@@')(
+                func.to_tsquery(models.SEARCH_CONFIG, _postgres_query(title_terms))
+            ))
+        if q_terms:
+            tsquery = func.to_tsquery(models.SEARCH_CONFIG, _postgres_query(q_terms))
+            query = query.filter(models.document_tsvector().op('@@')(tsquery))
+            rank = func.ts_rank(models.document_tsvector(), tsquery).desc()
+    elif q_terms or title_terms:
+        match = []
+        if q_terms:
+            match.append(f"({_sqlite_query(q_terms)})")
+        if title_terms:
+            match.append(f"job_title : ({_sqlite_query(title_terms)})")
+        match = text("posts_fts MATCH :match").bindparams(match=" AND ".join(match))
+        if q_terms:
+            query = query.join(posts_fts, posts_fts.c.rowid == models.Post.id).filter(match)
+            rank = posts_fts.c.rank.asc()
+        else:
+            query = query.filter(models.Post.id.in_(select(posts_fts.c.rowid).where(match)))
+
+    if skills:
+        # Any of the provided skills
+        query = query.filter(exists().where(
+            models.PostSkill.post_id == models.Post.id,
+            models.PostSkill.skill.in_(normalize_skills(skills))
+        ))
+    if min_experience is not None:
+        query = query.filter(models.Post.experience_years >= min_experience)
+    if open_to_work is not None:
+        query = query.filter(models.Post.is_open_to_work == open_to_work)
+
+    if rank is not None:
+        query = query.order_by(rank, *NEWEST_FIRST.order_by())
+        return query.offset(offset_from_cursor(cursor)) if cursor else query
+    return NEWEST_FIRST.apply(query, cursor)
+
+def is_ranked(q: Optional[str]) -> bool:
+    return bool(search_terms(q))
+
+def rebuild(conn, batch_size: int = 5000):
+    """Rebuild post_skills (and the sqlite FTS table) from posts, on the caller's connection"""
+    conn.execute(delete(models.PostSkill))
+    rows = conn.execute(
+        select(models.Post.id, models.Post.skills)
+        .where(models.Post.skills.isnot(None))
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in rows.partitions():
+        skill_rows = [
+            {"post_id": post_id, "skill": skill}
+            for post_id, skills in partition
+            for skill in normalize_skills(skills)
+        ]
+        if skill_rows:
+            conn.execute(insert(models.PostSkill), skill_rows)
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"))
+
+def backfill(batch_size: int = 5000):
+    """Rebuild post_skills and the FTS table for posts written before they existed"""
+    from shared.database import get_engine
+
+    with get_engine().begin() as conn:
+        rebuild(conn, batch_size)
+
+if __name__ == "__main__":
+    backfill()
@@ -1,15 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, status, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List
 import models, schemas
-from shared.database import engine, get_db
+from shared.database import get_db
 from shared.auth import get_current_user, auth_handler
-from shared.middleware import error_handler
+from shared.middleware import add_shared_middleware
+from shared.batch import BatchRequest, BatchResponse, fetch_batch
+from shared.cache import etag_for, response_cache
+from shared.events import emitter
+from shared.lifespan import readiness, service_lifespan
+from shared.metrics import metrics_endpoint
+from shared.s3 import s3_handler
 from fastapi.middleware.cors import CORSMiddleware
 
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="User Service")
+app = FastAPI(title="User Service", lifespan=service_lifespan(s3_handler.connect))
+add_shared_middleware(app, rate_limit=100, routes={
+    ("POST", "/users/login"): 5,  # 5 attempts per minute
+    ("POST", "/users/"): 10,      # 10 new accounts per minute
+})
+# Added last so it runs first: 429s and 500s from the shared stack still get CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, replace with specific origins
@@ -17,18 +27,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.middleware("http")(error_handler)
+app.get("/metrics")(metrics_endpoint)
+app.get("/ready")(readiness)
 
 @app.post("/users/", response_model=schemas.UserResponse)
-async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user exists
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if await db.scalar(select(models.User).filter(models.User.email == user.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if db.query(models.User).filter(models.User.username == user.username).first():
+    if await db.scalar(select(models.User).filter(models.User.username == user.username)):
         raise HTTPException(status_code=400, detail="Username already taken")
     
     # Hash password and create user
-    hashed_password = auth_handler.get_password_hash(user.password)
+    hashed_password = await auth_handler.get_password_hash(user.password)
     db_user = models.User(
         email=user.email,
         username=user.username,
@@ -38,50 +49,111 @@ async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         profile_picture=user.profile_picture
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
+@app.post("/users/batch", response_model=BatchResponse[schemas.UserResponse])
+async def get_users_batch(batch: BatchRequest, db: AsyncSession = Depends(get_db)):
+    return await fetch_batch(db, models.User, batch.ids)
+
 @app.get("/users/{user_id}", response_model=schemas.UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user(user_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    key = await response_cache.scope(f"user:{user_id}")
+    cached = await response_cache.lookup(request, key)
+    if cached:
+        return cached
+    result = await db.execute(select(models.User).filter(models.User.id == user_id))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return await response_cache.store(request, key, etag_for(user), schemas.UserResponse, user)
 
 @app.put("/users/{user_id}", response_model=schemas.UserResponse)
 async def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    result = await db.execute(select(models.User).filter(models.User.id == user_id))
+    db_user = result.scalars().first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     update_data = user_update.dict(exclude_unset=True)
     if "password" in update_data:
-        update_data["hashed_password"] = auth_handler.get_password_hash(update_data.pop("password"))
+        update_data["hashed_password"] = await auth_handler.get_password_hash(update_data.pop("password"))
     
     for key, value in update_data.items():
         setattr(db_user, key, value)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await response_cache.bump(f"user:{user_id}")
+    await db.refresh(db_user)
+    return db_user
+
+@app.post("/users/{user_id}/profile-picture/upload", response_model=schemas.UploadTicket)
+async def create_profile_picture_upload(
+    user_id: int,
+    upload: schemas.UploadRequest,
+    current_user_id: int = Depends(get_current_user)
+):
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Cannot change other users' profile pictures")
+    return s3_handler.create_presigned_upload(
+        file_type="image",
+        owner_id=current_user_id,
+        content_type=upload.content_type,
+        size=upload.size
+    )
+
+@app.post("/users/{user_id}/profile-picture", response_model=schemas.UserResponse)
+async def finalize_profile_picture(
+    user_id: int,
+    finalize: schemas.ProfilePictureFinalize,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user)
+):
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Cannot change other users' profile pictures")
+
+    result = await db.execute(select(models.User).filter(models.User.id == user_id))
+    db_user = result.scalars().first()
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    db_user.profile_picture = await s3_handler.verify_upload(finalize.upload_key, file_type="image", owner_id=current_user_id)
+    await db.commit()
+    await response_cache.bump(f"user:{user_id}")
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/users/login")
 async def login(
     user_credentials: schemas.UserLogin,  # Create new schema for login
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(models.User).filter(models.User.email == user_credentials.email).first()
-    if not user or not auth_handler.verify_password(user_credentials.password, user.hashed_password):
+    result = await db.execute(select(models.User).filter(models.User.email == user_credentials.email))
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials"
+        )
+    
+    valid, new_hash = await auth_handler.verify_and_update_password(user_credentials.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
+    # Cost parameters changed since this hash was made, store an upgraded one
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
+    emitter.emit("login", user_id=user.id)
     token = auth_handler.create_access_token(user.id)
     return {"access_token": token, "token_type": "bearer"}
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, validator, Field
-from typing import Annotated, Optional
+from typing import Annotated, Dict, Optional
 from datetime import datetime
 import re
 
@@ -76,4 +76,17 @@ class UserResponse(UserBase):
     updated_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class UploadRequest(BaseModel):
+    content_type: str
+    size: int = Field(..., gt=0, description="File size in bytes")
+
+class UploadTicket(BaseModel):
+    url: str
+    fields: Dict[str, str]
+    key: str
+    expires_in: int
+
+class ProfilePictureFinalize(BaseModel):
+    upload_key: str  # key returned by the profile picture upload endpoint
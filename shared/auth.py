@@ -1,24 +1,194 @@
-from fastapi import HTTPException, Security
+from fastapi import Header, HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from typing import Optional, Tuple
 import jwt
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import hmac
 import os
+import threading
+import time
+
+from shared.metrics import auth_token_cache_hits, auth_token_cache_misses
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+class TokenCache:
+    """Bounded LRU of verified tokens -> user_id.
+
+    Keyed by SHA-256 of the token so raw bearer tokens are never held in memory. An entry
+    lives for at most `ttl` seconds and never past the token's own `exp`.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # digest -> (user_id, expires_at)
+        self._lock = threading.Lock()  # get_current_user runs in the threadpool
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[int]:
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    auth_token_cache_hits.inc()
+                    return entry[0]
+                del self._entries[key]
+            self.misses += 1
+        auth_token_cache_misses.inc()
+        return None
+
+    def set(self, token: str, user_id: int, exp: float):
+        key = self._key(token)
+        expires_at = min(time.time() + self.ttl, exp)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class PasswordHasher:
+    """bcrypt hashing on a small thread pool (bcrypt releases the GIL) instead of the event loop.
+
+    At most `workers` hashes run at once; callers queue for a slot and get a 503 after
+    `queue_timeout` seconds, so a login storm sheds load instead of stalling every request.
+    Hashes made with a different cost than `rounds` are flagged for rehash on next login.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 2, queue_timeout: float = 5.0):
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = asyncio.Semaphore(workers)
+
+    async def _run(self, fn, *args):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many concurrent password operations, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(self.context.verify_and_update, password, hashed_password)
 
 class AuthHandler:
     secret = os.getenv("JWT_SECRET_KEY", "your-secret-key")
+    access_token_expire_minutes = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+    def __init__(self, token_cache: Optional[TokenCache] = None, password_hasher: Optional[PasswordHasher] = None):
+        self.token_cache = token_cache
+        self.password_hasher = password_hasher or PasswordHasher()
+
+    async def get_password_hash(self, password: str) -> str:
+        return await self.password_hasher.hash(password)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.password_hasher.verify(plain_password, hashed_password)
+
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, and return a fresh hash when the stored one uses outdated cost parameters"""
+        return await self.password_hasher.verify_and_update(plain_password, hashed_password)
+
+    def create_access_token(self, user_id: int) -> str:
+        payload = {
+            "user_id": user_id,
+            "exp": datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes),
+        }
+        return jwt.encode(payload, self.secret, algorithm="HS256")
 
     def decode_token(self, token: str) -> int:
+        if self.token_cache is not None:
+            user_id = self.token_cache.get(token)
+            if user_id is not None:
+                return user_id
         try:
             payload = jwt.decode(token, self.secret, algorithms=["HS256"])
             if payload["exp"] < datetime.utcnow().timestamp():
                 raise HTTPException(status_code=401, detail="Token has expired")
-            return payload["user_id"]
         except jwt.InvalidTokenError:
             raise HTTPException(status_code=401, detail="Invalid token")
+        if self.token_cache is not None:
+            self.token_cache.set(token, payload["user_id"], payload["exp"])
+        return payload["user_id"]
 
-auth_handler = AuthHandler()
+auth_handler = AuthHandler(
+    token_cache=TokenCache(
+        maxsize=int(os.getenv("JWT_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("JWT_CACHE_TTL", "300")),
+    ) if os.getenv("JWT_CACHE_ENABLED", "true").lower() == "true" else None,
+    password_hasher=PasswordHasher(
+        rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+        workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+        queue_timeout=float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5")),
+    ),
+)
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> int:
-    return auth_handler.decode_token(credentials.credentials) 
\ No newline at end of file
+    return auth_handler.decode_token(credentials.credentials)
+
+def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security)) -> Optional[int]:
+    """user_id for a valid bearer token, None for anonymous requests or bad tokens"""
+    if credentials is None:
+        return None
+    try:
+        return auth_handler.decode_token(credentials.credentials)
+    except HTTPException:
+        return None
+
+IMPORT_API_KEY = os.getenv("IMPORT_API_KEY") or None
+EXPORT_API_KEY = os.getenv("EXPORT_API_KEY") or None
+
+def _check_api_key(expected: Optional[str], given: Optional[str], name: str):
+    if expected is None:
+        raise HTTPException(status_code=403, detail=f"Bulk {name} is disabled")
+    if given is None or not hmac.compare_digest(given.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail=f"Invalid {name} key")
+
+def require_import_key(x_import_key: Optional[str] = Header(None)):
+    """Guards bulk import endpoints, which write rows on behalf of any user"""
+    _check_api_key(IMPORT_API_KEY, x_import_key, "import")
+
+def require_export_key(x_export_key: Optional[str] = Header(None)):
+    """Guards full-table exports, which hold a DB connection for as long as the client reads"""
+    _check_api_key(EXPORT_API_KEY, x_export_key, "export")
@@ -0,0 +1,46 @@
+from pydantic import BaseModel, Field
+from sqlalchemy import insert, select
+from typing import Generic, List, Optional, TypeVar
+from itertools import groupby
+import os
+
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", "500"))
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", "1000"))
+
+T = TypeVar("T")
+
+class BatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+class BatchItem(BaseModel, Generic[T]):
+    id: int
+    found: bool
+    item: Optional[T] = None
+
+class BatchResponse(BaseModel, Generic[T]):
+    results: List[BatchItem[T]]  # same order (and duplicates) as the requested ids
+
+class BulkRequest(BaseModel, Generic[T]):
+    items: List[T] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class BulkResponse(BaseModel):
+    ids: List[int]  # of the created rows, in item order
+
+async def fetch_batch(db, model, ids: List[int]) -> dict:
+    """Load many rows by primary key with one IN query, in request order; missing ids come back with found=false"""
+    rows = await db.execute(select(model).where(model.id.in_(set(ids))))
+    by_id = {row.id: row for row in rows.scalars()}
+    return {"results": [{"id": id, "found": id in by_id, "item": by_id.get(id)} for id in ids]}
+
+async def insert_many(db, model, rows: List[dict]) -> List[int]:
+    """INSERT ... RETURNING id for many rows, in item order.
+
+    SQLAlchemy batches these into multi-row VALUES (insertmanyvalues) on asyncpg and sqlite, so
+    it is a handful of round trips instead of one per row. A statement covers one run of rows
+    with the same columns; rows that leave a column out (for its server default) start a new one.
+    """
+    ids = []
+    for _, run in groupby(rows, key=tuple):
+        result = await db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), list(run))
+        ids.extend(result.scalars())
+    return ids
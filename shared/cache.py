@@ -0,0 +1,215 @@
+from collections import OrderedDict
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from typing import Dict, NamedTuple, Optional
+import hashlib
+import json
+import os
+import threading
+import time
+
+from shared.metrics import response_cache_evictions, response_cache_hits, response_cache_misses
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # only needed for the shared backend
+    redis = None
+
+class CacheBackend:
+    """Byte-string store with per-entry TTL"""
+    name = "none"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bytes:
+        """Store value unless the key is already set; returns whichever value is stored"""
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+class InMemoryCache(CacheBackend):
+    """Per-process LRU bounded by total value size; expired entries are dropped when read"""
+    name = "memory"
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        with self.lock:
+            self._put(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bytes:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            self._put(key, value, ttl)
+            return value
+
+    async def delete(self, *keys: str):
+        with self.lock:
+            for key in keys:
+                self._remove(key)
+
+    def _put(self, key: str, value: bytes, ttl: float):
+        self._remove(key)
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.size += len(value)
+        while self.size > self.max_bytes and self.entries:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            response_cache_evictions.labels(backend=self.name).inc()
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def __len__(self):
+        return len(self.entries)
+
+class RedisCache(CacheBackend):
+    """Entries shared by every worker/replica, so an invalidation is seen everywhere"""
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "cache:"):
+        if redis is None:
+            raise RuntimeError("RedisCache requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bytes:
+        if await self.client.set(self.prefix + key, value, px=int(ttl * 1000), nx=True):
+            return value
+        return await self.client.get(self.prefix + key) or value
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*[self.prefix + key for key in keys])
+
+def etag_for(*rows, extra=()) -> str:
+    """Validator built from each row's id and last write time, so it is known before serializing"""
+    # Projected rows (shared.projection) have no __tablename__; their keys are table-scoped anyway
+    parts = [(getattr(row, "__tablename__", None), row.id, str(row.created_at), str(row.updated_at)) for row in rows]
+    digest = hashlib.blake2b(repr((parts, extra)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    headers: Dict[str, str]
+
+    def pack(self) -> bytes:
+        return json.dumps({"etag": self.etag, "headers": self.headers}).encode() + b"\n" + self.body
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "CachedResponse":
+        meta, body = data.split(b"\n", 1)
+        meta = json.loads(meta)
+        return cls(meta["etag"], body, meta["headers"])
+
+    def to_response(self, request: Request) -> Response:
+        # no-cache: clients may keep the body but must revalidate, which is a cheap 304
+        headers = {**self.headers, "ETag": self.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+class ResponseCache:
+    """Read-through cache of serialized GET responses.
+
+    Keys live under a scope (one resource, or a collection such as all comment pages of a
+    post) whose generation changes on every write, so one bump retires everything in it.
+    Readers take the generation before reading the database: a read that raced a write
+    stores its stale body under the retired generation, where nothing looks any more.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float = 30.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.adapters = {}
+
+    async def lookup(self, request: Request, key: str) -> Optional[Response]:
+        if self.backend is None:
+            return None
+        data = await self.backend.get(key)
+        if data is None:
+            response_cache_misses.labels(backend=self.backend.name).inc()
+            return None
+        response_cache_hits.labels(backend=self.backend.name).inc()
+        return CachedResponse.unpack(data).to_response(request)
+
+    async def store(self, request: Request, key: str, etag: str, schema, data, headers: Optional[Dict[str, str]] = None) -> Response:
+        """Serialize `data` with `schema`, cache it and answer the request (304 skips serializing)"""
+        adapter = self.adapters.get(schema)
+        if adapter is None:
+            adapter = self.adapters[schema] = TypeAdapter(schema)
+        return await self.store_body(
+            request, key, etag, lambda: adapter.dump_json(adapter.validate_python(data, from_attributes=True)), headers
+        )
+
+    async def store_body(self, request: Request, key: str, etag: str, body, headers: Optional[Dict[str, str]] = None) -> Response:
+        """store() for a body serialized elsewhere; pass a callable to skip serializing on a 304"""
+        headers = headers or {}
+        if etag_matches(request, etag):
+            return CachedResponse(etag, b"", headers).to_response(request)
+        entry = CachedResponse(etag, body() if callable(body) else body, headers)
+        if self.backend is not None:
+            await self.backend.set(key, entry.pack(), self.ttl)
+        return entry.to_response(request)
+
+    async def scope(self, name: str) -> str:
+        """Current key for `name` (e.g. post:1), or prefix for the keys of a collection"""
+        if self.backend is None:
+            return name
+        # A fresh generation never matches an older one, even if the old one was evicted
+        generation = await self.backend.add(f"gen:{name}", str(time.time_ns()).encode(), self.ttl * 10)
+        return f"{name}:{generation.decode()}"
+
+    async def bump(self, name: str):
+        if self.backend is not None:
+            await self.backend.set(f"gen:{name}", str(time.time_ns()).encode(), self.ttl * 10)
+
+def cache_backend_from_env() -> Optional[CacheBackend]:
+    backend = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    if backend == "redis":
+        return RedisCache(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    if backend == "memory":
+        return InMemoryCache(max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+    return None  # "none" turns caching off but keeps ETag/304 handling
+
+response_cache = ResponseCache(cache_backend_from_env(), ttl=float(os.getenv("RESPONSE_CACHE_TTL", "30")))
@@ -0,0 +1,122 @@
+from typing import List, Optional
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import threading
+
+from shared.metrics import analytics_events_dropped, analytics_events_sent
+
+# emitting is optional, services run fine without analytics; httpx itself is slow to import,
+# so it is only loaded by connect()
+HTTPX_AVAILABLE = importlib.util.find_spec("httpx") is not None
+
+logger = logging.getLogger(__name__)
+
+class EventEmitter:
+    """Fire-and-forget analytics events, shipped to analytics_service in NDJSON batches.
+
+    emit() only appends to a bounded queue, so it never waits on the network; a background
+    task flushes every `batch_size` events or `flush_interval` seconds. When the queue is full
+    (analytics slow or down) new events are dropped and counted rather than buffered forever.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str],
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        transport=None,
+    ):
+        self.url = url.rstrip("/") + "/events/batch" if url else None
+        self.transport = transport  # httpx transport override, e.g. ASGITransport to an in-process app
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.client = None
+        self._connect_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.url is not None and HTTPX_AVAILABLE
+
+    def emit(self, event_type: str, **fields):
+        if not self.enabled:
+            return
+        if self.task is None:
+            self._start()
+        try:
+            self.queue.put_nowait({"event_type": event_type, **fields})
+        except asyncio.QueueFull:
+            analytics_events_dropped.labels(reason="queue_full").inc()
+
+    def connect(self):
+        """Build the HTTP client; the lifespan warm-up calls this so the first emit doesn't have to"""
+        with self._connect_lock:
+            if self.enabled and self.client is None:
+                import httpx
+                self.client = httpx.AsyncClient(timeout=5.0, transport=self.transport)
+
+    def _start(self):
+        # Lazily on the first emit, so the queue and task belong to the running loop
+        self.connect()
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            await self._send(batch)
+
+    async def _next_batch(self) -> List[dict]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # Take whatever is already queued without yielding, then wait out the interval
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send(self, batch: List[dict]):
+        body = "\n".join(json.dumps(event) for event in batch).encode()
+        try:
+            response = await self.client.post(self.url, content=body, headers={"Content-Type": "application/x-ndjson"})
+            response.raise_for_status()
+        except Exception as e:
+            analytics_events_dropped.labels(reason="send_failed").inc(len(batch))
+            logger.warning(f"Dropped {len(batch)} analytics events: {e}")
+            return
+        analytics_events_sent.inc(len(batch))
+
+    async def aclose(self):
+        """Flush what is queued and stop; for shutdown hooks"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        while not self.queue.empty():
+            batch = [self.queue.get_nowait() for _ in range(min(self.batch_size, self.queue.qsize()))]
+            await self._send(batch)
+        await self.client.aclose()
+        self.client = None
+        self.task = None
+
+emitter = EventEmitter(
+    os.getenv("ANALYTICS_URL") or None,
+    max_queue=int(os.getenv("ANALYTICS_MAX_QUEUE", "10000")),
+    batch_size=int(os.getenv("ANALYTICS_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "1.0")),
+)
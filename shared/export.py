@@ -0,0 +1,97 @@
+"""Streaming NDJSON / CSV exports of whole tables.
+
+Rows come off a server-side cursor (stream + yield_per) on a plain connection, a batch at a
+time, so neither the process nor an ORM identity map grows with the table. The export opens
+its own connection because the request's session is closed before a streamed body is sent.
+"""
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+import csv
+import io
+import os
+import zlib
+
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import literal, or_
+
+from shared.database import get_async_engine
+from shared.pagination import StoredDateTime
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_STARTED_HEADER = "X-Export-Started-At"
+
+def changed_since(model, since: datetime):
+    """Rows created or updated at or after `since`, for incremental pulls"""
+    since = literal(since, StoredDateTime())
+    return or_(model.created_at >= since, model.updated_at >= since)
+
+def export_format(request: Request, format: Optional[str]) -> str:
+    """?format= wins, then the Accept header, then NDJSON"""
+    if format is None:
+        accept = request.headers.get("accept", "")
+        format = "csv" if "text/csv" in accept else "ndjson"
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return format
+
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+async def _batches(query, batch_size: int) -> AsyncIterator:
+    async with get_async_engine().connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+async def _encode(projection, query, format: str, batch_size: int) -> AsyncIterator[bytes]:
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(projection.keys + list(projection.computed))
+        async for rows in _batches(query, batch_size):
+            for row in rows:
+                writer.writerow([_csv_value(value) for value in projection.dict(row).values()])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():  # header only, empty export
+            yield buffer.getvalue().encode()
+    else:
+        async for rows in _batches(query, batch_size):
+            yield b"".join(orjson.dumps(projection.dict(row), option=orjson.OPT_UTC_Z) + b"\n" for row in rows)
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(request: Request, projection, query, format: str, batch_size: int = EXPORT_BATCH_SIZE) -> StreamingResponse:
+    """Stream `projection` rows of `query`, gzipped when the client accepts it.
+
+    X-Export-Started-At is taken before the query runs; pass it back as updated_since to pull
+    only what changed since this export (deletes are not included).
+    """
+    headers = {
+        # Whole seconds: sqlite CURRENT_TIMESTAMP has no fraction, rounding down re-sends rather than skips
+        EXPORT_STARTED_HEADER: datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        "Vary": "Accept-Encoding",
+        "Content-Disposition": f'attachment; filename="{projection.name}.{format}"',
+    }
+    body = _encode(projection, query, format, batch_size)
+    if accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        body = _gzip(body)
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[format], headers=headers)
@@ -0,0 +1,60 @@
+"""Startup and shutdown for the API services, and their readiness probe.
+
+Importing a service does no I/O. The lifespan lets it start serving right away and warms up
+in the background: a database round trip, the analytics emitter's HTTP client, and whatever
+the service passes in (the S3 client and libmagic for the upload services). /health answers
+as soon as the process is up; /ready only once warm-up has finished and the database
+answers, so traffic is held until then.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Callable, Sequence
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from shared.database import close_db, ping_db
+from shared.events import emitter
+
+logger = logging.getLogger(__name__)
+
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "2"))  # seconds
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "2"))  # seconds per readiness DB check
+
+async def warm_up(app: FastAPI, warmups: Sequence[Callable[[], None]]):
+    # Keep retrying: the database may come up after the service does
+    while True:
+        try:
+            await ping_db()
+            for warmup in (emitter.connect, *warmups):
+                await run_in_threadpool(warmup)
+        except Exception as e:
+            logger.warning(f"Warm-up failed, retrying in {WARMUP_RETRY_INTERVAL}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+            continue
+        app.state.ready = True
+        return
+
+def service_lifespan(*warmups: Callable[[], None]):
+    """Lifespan for a service; `warmups` are blocking setup calls, run in the threadpool"""
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.ready = False
+        task = asyncio.create_task(warm_up(app, warmups))
+        yield
+        task.cancel()
+        await emitter.aclose()
+        await close_db()
+    return lifespan
+
+async def readiness(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    try:
+        await asyncio.wait_for(ping_db(), READY_TIMEOUT)
+    except Exception:
+        return JSONResponse(status_code=503, content={"status": "database unavailable"})
+    return {"status": "ready"}
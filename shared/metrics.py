@@ -0,0 +1,181 @@
+from fastapi.responses import Response
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Optional
+import time
+
+# HTTP request metrics, labelled by route template (/posts/{post_id}), never the raw path
+http_request_duration = Histogram(
+    'http_request_duration_seconds',
+    'Request latency in seconds',
+    ['route', 'method', 'status']  # status class: 2xx, 4xx, ...
+)
+
+http_requests_in_flight = Gauge(
+    'http_requests_in_flight',
+    'Requests currently being handled'
+)
+
+# Upper bound on (route, method, status) series; anything past it is folded into "other"
+MAX_HTTP_SERIES = 500
+HTTP_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+# Connection pool metrics, labelled by engine ("sync" or "async")
+db_connection_pool = Gauge(
+    'db_connection_pool_size',
+    'Configured size of the database connection pool',
+    ['engine']
+)
+
+db_connection_pool_checked_out = Gauge(
+    'db_connection_pool_checked_out',
+    'Connections currently checked out of the pool',
+    ['engine']
+)
+
+db_connection_pool_idle = Gauge(
+    'db_connection_pool_idle',
+    'Connections sitting idle in the pool',
+    ['engine']
+)
+
+db_connection_pool_overflow = Gauge(
+    'db_connection_pool_overflow',
+    'Connections opened beyond pool_size (negative while the pool is still filling)',
+    ['engine']
+)
+
+db_connection_pool_wait = Histogram(
+    'db_connection_pool_wait_seconds',
+    'Time spent waiting to check a connection out of the pool',
+    ['engine'],
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+
+# Verified-JWT cache
+auth_token_cache_hits = Counter(
+    'auth_token_cache_hits_total',
+    'Bearer tokens resolved from the verified-token cache'
+)
+
+auth_token_cache_misses = Counter(
+    'auth_token_cache_misses_total',
+    'Bearer tokens that needed a full JWT verify'
+)
+
+# Read-through response cache, labelled by cache backend ("memory" or "redis")
+response_cache_hits = Counter(
+    'response_cache_hits_total',
+    'GET responses served from the response cache',
+    ['backend']
+)
+
+response_cache_misses = Counter(
+    'response_cache_misses_total',
+    'GET responses that had to be loaded from the database',
+    ['backend']
+)
+
+response_cache_evictions = Counter(
+    'response_cache_evictions_total',
+    'Entries dropped from the in-process cache to stay under its size limit',
+    ['backend']
+)
+
+# Analytics event emitter (shared/events.py)
+analytics_events_sent = Counter(
+    'analytics_events_sent_total',
+    'Events delivered to analytics_service'
+)
+
+analytics_events_dropped = Counter(
+    'analytics_events_dropped_total',
+    'Events dropped instead of delaying requests',
+    ['reason']  # queue_full, send_failed
+)
+
+class _TimedCheckoutMixin:
+    engine_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_connection_pool_wait.labels(engine=self.engine_label).observe(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    engine_label = "sync"
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+def instrument_pool(engine, label: str):
+    """Export pool occupancy gauges for an engine; values are read from the pool at scrape time"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        # NullPool/StaticPool (sqlite) have nothing to report
+        return
+    db_connection_pool.labels(engine=label).set_function(pool.size)
+    db_connection_pool_checked_out.labels(engine=label).set_function(pool.checkedout)
+    db_connection_pool_idle.labels(engine=label).set_function(pool.checkedin)
+    db_connection_pool_overflow.labels(engine=label).set_function(pool.overflow)
+
+_http_series = {}  # label tuple -> histogram child, so the hot path skips .labels()
+
+def _http_child(route: str, method: str, status: str):
+    key = (route, method, status)
+    child = _http_series.get(key)
+    if child is None:
+        if len(_http_series) >= MAX_HTTP_SERIES:
+            key = ("other", "other", status)
+            child = _http_series.get(key)
+        if child is None:
+            child = _http_series[key] = http_request_duration.labels(*key)
+    return child
+
+class MetricsMiddleware:
+    """Latency by route template, method and status class, plus the in-flight gauge.
+
+    Raw ASGI rather than BaseHTTPMiddleware: no per-request task or body stream wrapper, and
+    the time covers the whole response, streamed bodies included.
+    """
+
+    def __init__(self, app, emitter=None, service: Optional[str] = None):
+        self.app = app
+        # When given, every routed request is also sent to analytics as a "request" event,
+        # which feeds its per-route latency sketches
+        self.emitter = emitter
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = "5xx"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = f"{message['status'] // 100}xx"
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # Set by the router once it matched (or by the rate limiter for 429s); unmatched
+            # paths (404s, scanners) share one label
+            route = scope.get("route")
+            template = route.path if route is not None else scope.get("route_template", "unmatched")
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+            elapsed = time.perf_counter() - start
+            _http_child(template, method, status).observe(elapsed)
+            if self.emitter is not None and template != "unmatched":
+                self.emitter.emit("request", service=self.service, route=template, duration_ms=elapsed * 1000)
+
+async def metrics_endpoint():
+    """Endpoint for Prometheus to scrape metrics"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,74 +1,105 @@
-from fastapi import Request, HTTPException
+from fastapi import Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
+from typing import Dict, Optional, Tuple
 import logging
-from typing import Callable
-import time
-from collections import defaultdict
-import asyncio
+import math
+import os
+from shared.events import emitter
+from shared.metrics import MetricsMiddleware
+from shared.rate_limit import RateLimit, RateLimiter, backend_from_env, client_address, route_template
 
 logger = logging.getLogger(__name__)
 
 # Rate limiting configuration
 RATE_LIMIT_DURATION = 60  # seconds
-MAX_REQUESTS = 100  # requests per duration
-SENSITIVE_ENDPOINTS = {
-    "/users/login": 5,  # 5 attempts per minute
-    "/users/": 10,      # 10 new accounts per minute
-}
+# Proxies (load balancer, ingress) in front of the services that append to X-Forwarded-For;
+# 0 limits on the peer address
+TRUSTED_PROXY_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", "0"))
+# Comma separated CIDRs that are never limited, e.g. the cluster network for service-to-service
+# calls to the /batch endpoints
+EXEMPT_NETWORKS = [network.strip() for network in os.getenv("RATE_LIMIT_EXEMPT_NETWORKS", "").split(",") if network.strip()]
 
-# Store for rate limiting
-rate_limit_store = defaultdict(lambda: {"count": 0, "reset_time": 0})
-rate_limit_lock = asyncio.Lock()
+rate_limit_backend = backend_from_env(ttl=RATE_LIMIT_DURATION)
 
-async def rate_limit_middleware(request: Request, call_next: Callable):
-    client_ip = request.client.host
-    path = request.url.path
-    current_time = time.time()
+# The middlewares below are raw ASGI apps instead of app.middleware("http") functions:
+# BaseHTTPMiddleware costs a task and a body stream wrapper per request, per middleware,
+# and buffers streaming responses through a queue.
 
-    # Get rate limit for this endpoint
-    max_requests = SENSITIVE_ENDPOINTS.get(path, MAX_REQUESTS)
-    
-    async with rate_limit_lock:
-        # Reset counter if duration has passed
-        if current_time > rate_limit_store[client_ip]["reset_time"]:
-            rate_limit_store[client_ip] = {
-                "count": 0,
-                "reset_time": current_time + RATE_LIMIT_DURATION
-            }
-        
-        # Increment counter
-        rate_limit_store[client_ip]["count"] += 1
-        
-        # Check if limit exceeded
-        if rate_limit_store[client_ip]["count"] > max_requests:
-            reset_time = rate_limit_store[client_ip]["reset_time"] - current_time
-            raise HTTPException(
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter, trusted_hops: int = TRUSTED_PROXY_HOPS):
+        self.app = app
+        self.limiter = limiter
+        self.trusted_hops = trusted_hops
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        client_ip = client_address(scope, self.trusted_hops)
+        if self.limiter.exempts(client_ip):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        template = self.limiter.route_template(request)
+        allowed, retry_after = await self.limiter.check(client_ip, request.method, template)
+        if not allowed:
+            # Rejected requests never reach the router, so hand MetricsMiddleware the label here
+            scope["route_template"] = template or route_template(request)
+            retry_after = math.ceil(retry_after)
+            response = JSONResponse(
                 status_code=429,
-                detail={
-                    "message": "Too many requests",
-                    "retry_after": int(reset_time)
-                }
+                content={"detail": {"message": "Too many requests", "retry_after": retry_after}},
+                headers={"Retry-After": str(retry_after)},
             )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+class ErrorHandlerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            if isinstance(e, SQLAlchemyError):
+                logger.error(f"Database error: {str(e)}")
+            else:
+                logger.error(f"Unexpected error: {str(e)}")
+            if started:
+                # Headers are already out (e.g. mid-stream), too late for a 500
+                raise
+            await JSONResponse(status_code=500, content={"detail": "Internal server error"})(scope, receive, send)
 
-    # Error handling middleware
-    try:
-        response = await call_next(request)
-        return response
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise e
-        raise HTTPException(
-            status_code=500,
-            detail="Internal server error"
-        )
+def add_shared_middleware(app, rate_limit: int, routes: Optional[Dict[Tuple[str, str], int]] = None):
+    """Error handling, rate limiting and metrics, metrics outermost so 429s and 500s are timed too.
 
-async def error_handler(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except SQLAlchemyError as e:
-        logger.error(f"Database error: {str(e)}")
-        return JSONResponse(status_code=500, content={"detail": "Internal server error"})
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return JSONResponse(status_code=500, content={"detail": "Internal server error"}) 
\ No newline at end of file
+    `rate_limit` is the service's requests per minute per client, shared by every route not in
+    `routes`, which maps (method, route template) to a limit of its own.
+    """
+    # "Post Service" -> post_service
+    service = app.title.lower().replace(" ", "_")
+    app.state.rate_limiter = RateLimiter(
+        rate_limit_backend,
+        default=RateLimit(rate_limit, RATE_LIMIT_DURATION),
+        routes={route: RateLimit(limit, RATE_LIMIT_DURATION) for route, limit in (routes or {}).items()},
+        exempt=EXEMPT_NETWORKS,
+        prefix=f"{service}:",
+    )
+    # add_middleware wraps what is already there, so the last one added runs first
+    app.add_middleware(ErrorHandlerMiddleware)
+    app.add_middleware(RateLimitMiddleware, limiter=app.state.rate_limiter)
+    app.add_middleware(MetricsMiddleware, emitter=emitter, service=service)
@@ -0,0 +1,113 @@
+"""Bring the database schema up to date. This is the deploy step that runs before the services start.
+
+The services don't touch the schema themselves. Run this once per deploy, against the same
+DATABASE_URL the services use:
+
+    python -m shared.migrate                          # every service under services/
+    python -m shared.migrate services/post_service    # just these
+    python -m shared.migrate --wait 60                # retry until the database accepts connections
+
+Tables that don't exist yet are created from the models (create_all). create_all leaves
+existing tables alone, so changes to them (new columns, indexes, triggers, backfills) are
+numbered steps in each service's migrations.py. The versions applied so far are recorded
+per service in schema_migrations, and each pending step runs once, in order, in its own
+transaction. Steps check before they change anything (see shared.schema), so they are also
+correct on a database create_all has just built.
+"""
+import argparse
+import glob
+import importlib
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, String, Table, insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from shared.database import Base, get_engine
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MIGRATION_LOCK_ID = 7240001  # Postgres advisory lock, so concurrent deploys apply steps once
+
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("service", String, primary_key=True),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+def service_dirs() -> List[str]:
+    return sorted(os.path.dirname(path) for path in glob.glob(os.path.join(ROOT, "services", "*", "models.py")))
+
+def load_service(service_dir: str):
+    """A service's migrations module (or just its models), imported next to its own flat modules"""
+    service_dir = os.path.abspath(service_dir)
+    # Every service has a `models`, `schemas`...; keep other services' copies out of the way
+    names = [os.path.basename(path)[:-3] for path in glob.glob(os.path.join(service_dir, "*.py"))]
+    saved = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+    sys.path.insert(0, service_dir)
+    try:
+        return importlib.import_module("migrations" if "migrations" in names else "models")
+    finally:
+        sys.path.remove(service_dir)
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+def wait_for_database(engine, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with engine.connect():
+                return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+def migrate(services: Optional[Sequence[str]] = None, wait: float = 0) -> List[Tuple[str, int, str]]:
+    """Create missing tables, then apply pending steps; returns the (service, version, name) applied"""
+    modules = [(os.path.basename(os.path.normpath(path)), load_service(path)) for path in services or service_dirs()]
+    engine = get_engine()
+    wait_for_database(engine, wait)
+    applied = []
+    with engine.connect() as lock:
+        if engine.dialect.name == "postgresql":
+            lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            lock.commit()
+        try:
+            Base.metadata.create_all(bind=engine)
+            for service, module in modules:
+                with engine.connect() as conn:
+                    done = set(conn.scalars(select(schema_migrations.c.version).where(schema_migrations.c.service == service)))
+                for version, name, step in getattr(module, "MIGRATIONS", []):
+                    if version in done:
+                        continue
+                    with engine.begin() as conn:
+                        step(conn)
+                        conn.execute(insert(schema_migrations).values(
+                            service=service, version=version, name=name, applied_at=datetime.now(timezone.utc)
+                        ))
+                    applied.append((service, version, name))
+        finally:
+            if engine.dialect.name == "postgresql":
+                lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                lock.commit()
+    return applied
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("services", nargs="*", help="service directories (default: all)")
+    parser.add_argument("--wait", type=float, default=0, help="seconds to wait for the database")
+    args = parser.parse_args()
+    applied = migrate(args.services, args.wait)
+    for service, version, name in applied:
+        print(f"applied {service} {version}: {name}")
+    print(f"{len(applied)} migration(s) applied" if applied else "no pending migrations")
+
+if __name__ == "__main__":
+    main()
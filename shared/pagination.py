@@ -0,0 +1,100 @@
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, String, TypeDecorator, literal, tuple_
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+import base64
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence) -> str:
+    payload = json.dumps(list(values), default=lambda v: v.isoformat(), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def offset_from_cursor(cursor: str) -> int:
+    values = decode_cursor(cursor)
+    if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values[0]
+
+def next_offset_cursor(offset: int, rows: List, limit: int) -> Optional[str]:
+    """Cursor for orderings with no stored sort key (e.g. relevance), where paging stays offset based"""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor([offset + len(rows)])
+
+class StoredDateTime(TypeDecorator):
+    """Binds a timestamp (cursor values, export watermarks) the way the column stores it.
+
+    sqlite keeps DATETIME as text and CURRENT_TIMESTAMP defaults have no fraction, while the stock
+    binding always appends ".000000", which breaks row-value comparisons within the same second.
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name == "sqlite" and value is not None:
+            # Stored as naive UTC text, so convert an offset rather than dropping it
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value.isoformat(sep=" ")
+        return value
+
+class Keyset:
+    """Seek pagination over a unique sort key, e.g. (created_at, id).
+
+    Every column sorts the same direction so the seek is a single row-value comparison
+    that a composite index on the same columns can satisfy, however deep the page.
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def order_by(self) -> list:
+        return [column.desc() if self.descending else column.asc() for column in self.columns]
+
+    def apply(self, query, cursor: Optional[str] = None):
+        query = query.order_by(*self.order_by())
+        if cursor is None:
+            return query
+        values = decode_cursor(cursor)
+        if len(values) != len(self.columns):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            values = [
+                literal(datetime.fromisoformat(value), StoredDateTime())
+                if isinstance(column.type, DateTime) and value is not None else value
+                for column, value in zip(self.columns, values)
+            ]
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        key, after = tuple_(*self.columns), tuple_(*values)
+        return query.filter(key < after if self.descending else key > after)
+
+    def next_cursor(self, rows: List, limit: int) -> Optional[str]:
+        """Cursor for the page after `rows`, or None once a short page shows we're at the end"""
+        if not rows or len(rows) < limit:
+            return None
+        last = rows[-1]
+        return encode_cursor([getattr(last, column.key) for column in self.columns])
+
+def set_next_cursor(response: Response, cursor: Optional[str]):
+    # Sent as a header so list bodies keep their shape for existing clients
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
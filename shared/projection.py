@@ -0,0 +1,43 @@
+"""List pages without the ORM or Pydantic: response columns only, serialized straight from rows by orjson"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        # UTC as "Z", like Pydantic; naive datetimes stay naive
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+class Projection:
+    """The columns of `model` that `schema` serializes, plus the schema's computed fields"""
+
+    def __init__(self, model, schema):
+        self.name = model.__tablename__
+        self.columns = [getattr(model, name) for name in schema.model_fields if hasattr(model, name)]
+        self.keys = [column.key for column in self.columns]
+        missing = set(schema.model_fields) - set(self.keys)
+        if missing:
+            raise ValueError(f"{model.__name__} has no columns for {schema.__name__} fields {sorted(missing)}")
+        # Properties of the response model; evaluated against the Row directly
+        self.computed = {name: info.wrapped_property.fget for name, info in schema.model_computed_fields.items()}
+
+    def select(self, *extra):
+        # Extra columns go after the projected ones, so dict() can ignore them
+        return select(*self.columns, *extra)
+
+    def dict(self, row) -> Dict[str, Any]:
+        data = dict(zip(self.keys, row))
+        for name, fget in self.computed.items():
+            data[name] = fget(row)
+        return data
+
+    def dicts(self, rows: Sequence) -> List[Dict[str, Any]]:
+        return [self.dict(row) for row in rows]
+
+    def response(self, rows: Sequence, headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+        return ORJSONResponse(self.dicts(rows), headers=headers)
+
+    def body(self, rows: Sequence) -> bytes:
+        return orjson.dumps(self.dicts(rows), option=orjson.OPT_UTC_Z)
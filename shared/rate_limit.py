@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from ipaddress import ip_address, ip_network
+from typing import Iterable, NamedTuple, Optional, Tuple
+from starlette.routing import Match
+import math
+import os
+import threading
+import time
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # only needed for the shared backend
+    redis = None
+
+class RateLimit(NamedTuple):
+    requests: int  # bucket capacity
+    period: float  # seconds to refill an empty bucket
+
+    @property
+    def refill_rate(self) -> float:
+        return self.requests / self.period
+
+class RateLimitBackend:
+    """Token-bucket store. hit() consumes one token and returns (allowed, retry_after seconds)"""
+
+    async def hit(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+class _Stripe:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()  # key -> [tokens, last_seen], oldest first
+
+class InMemoryBackend(RateLimitBackend):
+    """Per-process buckets split over lock stripes, so clients never contend on one lock.
+
+    A bucket idle for a full period has refilled completely, which is the same state as a
+    missing bucket, so idle keys are evicted after `ttl` without changing any decision.
+    `max_keys` caps memory; past it the least recently seen keys go first.
+    """
+
+    def __init__(self, stripes: int = 64, max_keys: int = 100_000, ttl: float = 60.0):
+        self.stripes = [_Stripe() for _ in range(stripes)]
+        self.max_keys_per_stripe = max(1, max_keys // stripes)
+        self.ttl = ttl
+
+    async def hit(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        return self.hit_sync(key, limit)
+
+    def hit_sync(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        now = time.monotonic()
+        stripe = self.stripes[hash(key) % len(self.stripes)]
+        with stripe.lock:
+            buckets = stripe.buckets
+            bucket = buckets.pop(key, None)
+            if bucket is None:
+                tokens = float(limit.requests)
+            else:
+                tokens = min(limit.requests, bucket[0] + (now - bucket[1]) * limit.refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (1 - tokens) / limit.refill_rate
+
+            buckets[key] = [tokens, now]
+            self._evict(buckets, now)
+        return allowed, retry_after
+
+    def _evict(self, buckets: OrderedDict, now: float):
+        while len(buckets) > self.max_keys_per_stripe:
+            buckets.popitem(last=False)
+        # Oldest entries are at the front; stop at the first one still in use
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if now - oldest[1] < self.ttl:
+                break
+            buckets.popitem(last=False)
+
+    def __len__(self):
+        return sum(len(stripe.buckets) for stripe in self.stripes)
+
+# Atomic token bucket in Redis; uses the server clock so workers don't need synced clocks
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + (now - tonumber(state[2])) * refill_rate)
+end
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / refill_rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(retry_after)}
+"""
+
+class RedisBackend(RateLimitBackend):
+    """Buckets shared by every worker/replica pointing at the same Redis"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if redis is None:
+            raise RuntimeError("RedisBackend requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def hit(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        ttl = math.ceil(limit.period)
+        allowed, retry_after = await self.script(
+            keys=[self.prefix + key],
+            args=[limit.requests, limit.refill_rate, ttl],
+        )
+        return bool(allowed), float(retry_after)
+
+def route_template(request) -> Optional[str]:
+    """Matched route path (e.g. /posts/{post_id}) so limits don't fan out per raw URL"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+def client_address(scope, trusted_hops: int = 0) -> str:
+    """Address to limit on: the peer, or behind `trusted_hops` proxies, the one the outermost proxy saw"""
+    if trusted_hops:
+        forwarded = [value.decode("latin-1") for name, value in scope["headers"] if name == b"x-forwarded-for"]
+        if forwarded:
+            hops = [hop.strip() for hop in ",".join(forwarded).split(",")]
+            # Each proxy appends the address it got the request from; anything further left
+            # came from the client and can be made up
+            return hops[max(0, len(hops) - trusted_hops)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend, default: RateLimit, routes: Optional[dict] = None,
+                 exempt: Iterable[str] = (), prefix: str = ""):
+        self.backend = backend
+        self.default = default
+        self.routes = routes or {}
+        self.exempt = [ip_network(network) for network in exempt]
+        self.prefix = prefix  # keeps services apart on a shared backend
+        self._scanned = {}  # id(router) -> routes worth matching, see route_template()
+
+    def exempts(self, client: str) -> bool:
+        if not self.exempt:
+            return False
+        try:
+            address = ip_address(client)
+        except ValueError:
+            return False
+        return any(address in network for network in self.exempt)
+
+    def route_template(self, request) -> Optional[str]:
+        """Like route_template(), but only as far as the last route with a limit of its own.
+
+        Anything matching later shares the default bucket anyway, so services without per-route
+        limits match nothing here. Routes are read once per app.
+        """
+        router = request.app.router
+        routes = self._scanned.get(id(router))
+        if routes is None:
+            limited = {template for _, template in self.routes}
+            last = max((i for i, route in enumerate(router.routes) if getattr(route, "path", None) in limited), default=-1)
+            # Earlier routes stay in: they may match first (/users/me before /users/{user_id})
+            routes = self._scanned[id(router)] = router.routes[:last + 1]
+        for route in routes:
+            match, _ = route.matches(request.scope)
+            if match == Match.FULL:
+                return route.path
+        return None
+
+    async def check(self, client: str, method: str, template: Optional[str]) -> Tuple[bool, float]:
+        limit = self.routes.get((method, template))
+        if limit is None:
+            # All unlisted routes share one bucket per client
+            return await self.backend.hit(f"{self.prefix}{client}:*", self.default)
+        return await self.backend.hit(f"{self.prefix}{client}:{method}:{template}", limit)
+
+def backend_from_env(ttl: float) -> RateLimitBackend:
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "redis":
+        return RedisBackend(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    return InMemoryBackend(
+        max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")),
+        ttl=ttl,
+    )
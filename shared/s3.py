@@ -0,0 +1,272 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from botocore.exceptions import ClientError
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from typing import Tuple
+from urllib.parse import urlparse
+from uuid import uuid4
+
+SNIFF_BYTES = 4096  # libmagic only needs the header to identify PDFs and images
+PART_SIZE = 8 * 1024 * 1024  # S3 multipart parts must be >= 5 MiB (except the last)
+
+# Direct-to-bucket uploads
+PRESIGNED_UPLOAD_EXPIRES = int(os.getenv('PRESIGNED_UPLOAD_EXPIRES', '900'))  # seconds
+UPLOAD_LIMITS = {
+    # file_type: (allowed content types, max size in bytes)
+    "resume": ({"application/pdf"}, int(os.getenv('MAX_RESUME_BYTES', str(10 * 1024 * 1024)))),
+    "image": ({"image/jpeg", "image/png", "image/gif", "image/webp"}, int(os.getenv('MAX_IMAGE_BYTES', str(5 * 1024 * 1024)))),
+}
+
+def sha256_file(fileobj) -> str:
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(PART_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+class S3Handler:
+    def __init__(self):
+        self.bucket_name = os.getenv('AWS_BUCKET_NAME')
+        # boto3 and libmagic are slow to load, so both are set up by connect() in the
+        # lifespan warm-up (or on first use) instead of at import
+        self._client = None
+        self._mime = None
+        self._connect_lock = threading.Lock()
+        # One libmagic handle for the process; it isn't thread safe, so calls are serialized
+        self._mime_lock = threading.Lock()
+
+    def connect(self):
+        with self._connect_lock:
+            if self._client is None:
+                import boto3
+                self._client = boto3.client(
+                    's3',
+                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                    region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                    endpoint_url=os.getenv('AWS_S3_ENDPOINT_URL') or None  # e.g. a local moto/minio server
+                )
+            if self._mime is None:
+                import magic
+                self._mime = magic.Magic(mime=True)
+
+    @property
+    def s3_client(self):
+        if self._client is None:
+            self.connect()
+        return self._client
+
+    def detect_type(self, head: bytes) -> str:
+        if self._mime is None:
+            self.connect()
+        with self._mime_lock:
+            return self._mime.from_buffer(head)
+
+    def check_type(self, detected_type: str, file_type: str):
+        if file_type == "resume" and not detected_type == "application/pdf":
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid file type. Only PDF files are allowed for resumes."
+            )
+        elif file_type == "image" and not detected_type.startswith('image/'):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid file type. Only images are allowed for profile pictures."
+            )
+
+    def object_url(self, key: str) -> str:
+        return f"https://{self.bucket_name}.s3.amazonaws.com/{key}"
+
+    def key_from_url(self, url: str) -> str:
+        return urlparse(url).path.lstrip('/')
+
+    async def object_exists(self, key: str) -> bool:
+        try:
+            await run_in_threadpool(self.s3_client.head_object, Bucket=self.bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def prepare_upload(self, file: UploadFile, file_type: str = "resume") -> Tuple[str, str]:
+        """Check an upload's type and work out its content-addressed key; returns (key, content type)"""
+        try:
+            # Sniff the type from the first few KB only
+            head = await file.read(SNIFF_BYTES)
+            detected_type = self.detect_type(head)
+            self.check_type(detected_type, file_type)
+
+            # The body is already spooled locally by Starlette, so hash it before touching the network
+            content_hash = await run_in_threadpool(sha256_file, file.file)
+            file_extension = mimetypes.guess_extension(detected_type) or ""
+            return f"{file_type}/{content_hash}{file_extension}", detected_type
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error uploading file: {str(e)}"
+            )
+
+    async def store_upload(self, file: UploadFile, key: str, content_type: str):
+        """Send a prepared upload, skipping the transfer if the object already exists"""
+        try:
+            if not await self.object_exists(key):
+                await file.seek(0)
+                await self._stream_upload(file, key, content_type)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error uploading file: {str(e)}"
+            )
+
+    async def upload_file(self, file: UploadFile, file_type: str = "resume") -> str:
+        """Store an upload under the SHA-256 of its content; identical files are only sent once.
+
+        Objects shared this way are reference counted by their users (see post_service/media.py),
+        which call store_upload() again once their reference is committed.
+        """
+        key, content_type = await self.prepare_upload(file, file_type)
+        await self.store_upload(file, key, content_type)
+        return self.object_url(key)
+
+    async def _stream_upload(self, file: UploadFile, key: str, content_type: str):
+        # Upload to S3, holding at most one part in memory
+        first_part = await file.read(PART_SIZE)
+        if len(first_part) < PART_SIZE:
+            await run_in_threadpool(
+                self.s3_client.put_object,
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=first_part,
+                ContentType=content_type
+            )
+        else:
+            await self._multipart_upload(file, key, content_type, first_part)
+
+    async def _multipart_upload(self, file: UploadFile, key: str, content_type: str, first_part: bytes):
+        upload = await run_in_threadpool(
+            self.s3_client.create_multipart_upload,
+            Bucket=self.bucket_name,
+            Key=key,
+            ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        try:
+            chunk = first_part
+            while chunk:
+                part_number = len(parts) + 1
+                response = await run_in_threadpool(
+                    self.s3_client.upload_part,
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=chunk
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+                chunk = await file.read(PART_SIZE)
+
+            await run_in_threadpool(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            await run_in_threadpool(
+                self.s3_client.abort_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id
+            )
+            raise
+
+    def create_presigned_upload(self, file_type: str, owner_id: int, content_type: str, size: int) -> dict:
+        """Presigned POST the client uploads to directly; S3 enforces the type and size.
+
+        Unlike upload_file() these keys are not content-addressed: the bytes never pass through
+        us, so every direct upload gets its own object, referenced once.
+        """
+        allowed_types, max_size = UPLOAD_LIMITS[file_type]
+        if content_type not in allowed_types:
+            raise HTTPException(status_code=400, detail=f"Content type must be one of: {', '.join(sorted(allowed_types))}")
+        if size > max_size:
+            raise HTTPException(status_code=400, detail=f"File too large, maximum is {max_size} bytes")
+
+        # Owner id in the key lets finalize check the upload belongs to the caller
+        extension = mimetypes.guess_extension(content_type) or ""
+        key = f"{file_type}/{owner_id}/{uuid4()}{extension}"
+        presigned = self.s3_client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, size],
+            ],
+            ExpiresIn=PRESIGNED_UPLOAD_EXPIRES
+        )
+        return {
+            "url": presigned["url"],
+            "fields": presigned["fields"],
+            "key": key,
+            "expires_in": PRESIGNED_UPLOAD_EXPIRES,
+        }
+
+    async def verify_upload(self, key: str, file_type: str, owner_id: int) -> str:
+        """Check a direct upload landed, fits the limits and really is the claimed type; returns its URL"""
+        if not key.startswith(f"{file_type}/{owner_id}/") or ".." in key:
+            raise HTTPException(status_code=403, detail="Upload does not belong to this user")
+
+        _, max_size = UPLOAD_LIMITS[file_type]
+        try:
+            head = await run_in_threadpool(self.s3_client.head_object, Bucket=self.bucket_name, Key=key)
+        except ClientError:
+            raise HTTPException(status_code=400, detail="Upload not found")
+
+        try:
+            if head["ContentLength"] > max_size:
+                raise HTTPException(status_code=400, detail=f"File too large, maximum is {max_size} bytes")
+            response = await run_in_threadpool(
+                self.s3_client.get_object,
+                Bucket=self.bucket_name,
+                Key=key,
+                Range=f"bytes=0-{SNIFF_BYTES - 1}"
+            )
+            sniffed = await run_in_threadpool(response["Body"].read)
+            self.check_type(self.detect_type(sniffed), file_type)
+        except HTTPException:
+            # Don't leave rejected uploads behind in the bucket
+            await run_in_threadpool(self.s3_client.delete_object, Bucket=self.bucket_name, Key=key)
+            raise
+
+        return self.object_url(key)
+
+    async def delete_file(self, url: str):
+        try:
+            if not url:
+                return
+
+            key = self.key_from_url(url)
+
+            await run_in_threadpool(
+                self.s3_client.delete_object,
+                Bucket=self.bucket_name,
+                Key=key
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error deleting file: {str(e)}"
+            )
+
+s3_handler = S3Handler()
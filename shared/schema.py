@@ -0,0 +1,23 @@
+"""Helpers for the schema steps in each service's migrations.py.
+
+All take the step's connection and do nothing when the change is already there.
+"""
+from typing import Optional, Sequence
+
+from sqlalchemy import Column, Table, inspect, text
+
+def has_column(conn, table: str, column: str) -> bool:
+    return column in {info["name"] for info in inspect(conn).get_columns(table)}
+
+def add_column(conn, column: Column) -> bool:
+    """ALTER TABLE ... ADD COLUMN for a model column; True if it was missing"""
+    if has_column(conn, column.table.name, column.name):
+        return False
+    conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"))
+    return True
+
+def create_indexes(conn, table: Table, names: Optional[Sequence[str]] = None):
+    """The model's indexes on `table` (or just `names`) that don't exist yet; ones limited to another dialect are skipped"""
+    for index in table.indexes:
+        if names is None or index.name in names:
+            index.create(conn, checkfirst=True)
@@ -0,0 +1,48 @@
+"""Environment for the tests: a throwaway sqlite database and moto's in-memory S3.
+
+Set before anything imports shared.*, which reads it at import time.
+"""
+import glob
+import importlib
+import os
+import sys
+import tempfile
+
+import pytest
+from moto import mock_aws
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+WORKDIR = tempfile.mkdtemp(prefix="smedia-tests-")
+BUCKET = "test-bucket"
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORKDIR, 'tests.db')}",
+    AWS_BUCKET_NAME=BUCKET,
+    AWS_ACCESS_KEY_ID="testing",
+    AWS_SECRET_ACCESS_KEY="testing",
+    AWS_S3_ENDPOINT_URL="",
+)
+sys.path[:0] = [os.path.join(ROOT, "services", "post_service"), ROOT]
+
+def load_service(name: str):
+    """Another service's main module, on its own flat models/schemas/... (post_service's stay importable)"""
+    service_dir = os.path.join(ROOT, "services", name)
+    names = [os.path.basename(path)[:-3] for path in glob.glob(os.path.join(service_dir, "*.py"))]
+    saved = {module: sys.modules.pop(module) for module in names if module in sys.modules}
+    sys.path.insert(0, service_dir)
+    try:
+        return importlib.import_module("main")
+    finally:
+        sys.path.remove(service_dir)
+        for module in names:
+            sys.modules.pop(module, None)
+        sys.modules.update(saved)
+
+@pytest.fixture
+def s3():
+    """shared.s3's handler against a fresh mocked bucket"""
+    from shared.s3 import s3_handler
+
+    with mock_aws():
+        s3_handler.s3_client.create_bucket(Bucket=BUCKET)
+        yield s3_handler
+        s3_handler._client = None  # bound to this mock
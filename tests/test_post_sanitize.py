@@ -0,0 +1,37 @@
+"""POST /posts/ must sanitize its form fields like every other post write path.
+
+Runs the real post service app against sqlite and moto's S3 (see conftest.py):
+
+    python -m pytest tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from shared.auth import auth_handler
+from shared.database import Base, get_engine
+
+PDF = b"%PDF-1.4\n%test resume\n"
+
+@pytest.fixture
+def client(s3):
+    Base.metadata.create_all(bind=get_engine())
+    with TestClient(main.app) as client:
+        client.headers["Authorization"] = f"Bearer {auth_handler.create_access_token(1)}"
+        yield client
+
+def test_create_post_strips_script(client):
+    response = client.post(
+        "/posts/",
+        params={"content": "<p>Hi</p><script>alert(1)</script>", "job_title": "<b>Dev</b><script>x</script>"},
+        files={"resume_file": ("resume.pdf", PDF, "application/pdf")},
+    )
+    assert response.status_code == 200, response.text
+    post = response.json()
+    assert "<script>" not in post["content"]
+    assert post["content"] == "<p>Hi</p>alert(1)"
+    assert post["job_title"] == "Devx"
+
+    stored = client.get(f"/posts/{post['id']}").json()
+    assert stored["content"] == post["content"]
+    assert stored["job_title"] == post["job_title"]
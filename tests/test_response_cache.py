@@ -0,0 +1,28 @@
+"""ResponseCache must not keep a body read before a write that invalidated it"""
+import asyncio
+
+from starlette.requests import Request
+
+from shared.cache import InMemoryCache, ResponseCache
+
+def get_request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/posts/1", "headers": []})
+
+def test_read_racing_a_write_is_not_cached():
+    async def run():
+        cache = ResponseCache(InMemoryCache(), ttl=30)
+        request = get_request()
+
+        # GET misses and reads the row...
+        key = await cache.scope("post:1")
+        assert await cache.lookup(request, key) is None
+        # ...a PUT commits and invalidates before the GET stores what it read
+        await cache.bump("post:1")
+        await cache.store_body(request, key, '"old"', b'{"content": "old"}')
+
+        key = await cache.scope("post:1")
+        assert await cache.lookup(request, key) is None
+        await cache.store_body(request, key, '"new"', b'{"content": "new"}')
+        return (await cache.lookup(request, await cache.scope("post:1"))).body
+
+    assert asyncio.run(run()) == b'{"content": "new"}'
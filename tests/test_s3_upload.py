@@ -0,0 +1,77 @@
+"""S3Handler.upload_file against moto: content-addressed keys, single put vs multipart, type checks"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from conftest import BUCKET
+from shared.s3 import PART_SIZE
+
+def upload_file(data: bytes) -> UploadFile:
+    # Spooled like Starlette's multipart bodies
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spool.write(data)
+    spool.seek(0)
+    return UploadFile(file=spool, filename="resume.pdf")
+
+def fake_pdf(size: int) -> bytes:
+    return (b"%PDF-1.4\n" + os.urandom(size))[:size]
+
+@pytest.fixture
+def calls(s3, monkeypatch):
+    """Counts of S3 API calls made through the handler's client"""
+    counts = Counter()
+    for name in ("put_object", "create_multipart_upload", "upload_part", "complete_multipart_upload"):
+        method = getattr(s3.s3_client, name)
+
+        def counted(*args, _name=name, _method=method, **kwargs):
+            counts[_name] += 1
+            return _method(*args, **kwargs)
+
+        monkeypatch.setattr(s3.s3_client, name, counted)
+    return counts
+
+def stored(s3, url: str) -> dict:
+    return s3.s3_client.head_object(Bucket=BUCKET, Key=s3.key_from_url(url))
+
+def test_small_file_is_one_put(s3, calls):
+    data = fake_pdf(64 * 1024)
+    url = asyncio.run(s3.upload_file(upload_file(data), file_type="resume"))
+
+    assert url.endswith(f"/resume/{hashlib.sha256(data).hexdigest()}.pdf")
+    head = stored(s3, url)
+    assert head["ContentLength"] == len(data)
+    assert head["ContentType"] == "application/pdf"
+    assert calls == Counter(put_object=1)
+
+def test_large_file_is_multipart(s3, calls):
+    data = fake_pdf(PART_SIZE + 1024)
+    url = asyncio.run(s3.upload_file(upload_file(data), file_type="resume"))
+
+    assert stored(s3, url)["ContentLength"] == len(data)
+    body = s3.s3_client.get_object(Bucket=BUCKET, Key=s3.key_from_url(url))["Body"].read()
+    assert body == data
+    assert calls["put_object"] == 0
+    assert calls["create_multipart_upload"] == 1
+    assert calls["upload_part"] == 2
+    assert calls["complete_multipart_upload"] == 1
+
+def test_rejects_non_pdf_resume(s3, calls):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(s3.upload_file(upload_file(b"just some text, not a pdf\n" * 100), file_type="resume"))
+
+    assert error.value.status_code == 400
+    assert sum(calls.values()) == 0
+    assert "Contents" not in s3.s3_client.list_objects_v2(Bucket=BUCKET)
+
+def test_identical_file_is_not_uploaded_again(s3, calls):
+    data = fake_pdf(64 * 1024)
+    first = asyncio.run(s3.upload_file(upload_file(data), file_type="resume"))
+    second = asyncio.run(s3.upload_file(upload_file(data), file_type="resume"))
+
+    assert first == second
+    assert calls == Counter(put_object=1)